@@ -10,45 +10,136 @@ import sqlite3
 
 
 class Database:
-    def __init__(self, db_path):
+    def __init__(self, db_path, busy_timeout=60000):
         """Initialize the Database connection.
 
         Args:
             db_path: Path to the SQLite database file. If the file doesn't
                 exist, it will be created when the connection is established.
+            busy_timeout: Milliseconds to wait for another connection's write
+                to finish before failing with "database is locked".
 
         Creates a connection to the SQLite database and initializes a cursor
-        for executing SQL queries.
+        for executing SQL queries. The connection uses write-ahead logging, so
+        the GUI can keep reading while a scan writes, and only syncs to disk at
+        checkpoints rather than on every commit.
         """
+        self.db_path = db_path
         self.connection = sqlite3.connect(db_path)
         self.cursor = self.connection.cursor()
 
+        # Tune the connection for large batch writes
+        self.cursor.execute("PRAGMA journal_mode = WAL;")
+        self.cursor.execute("PRAGMA synchronous = NORMAL;")
+        self.cursor.execute("PRAGMA cache_size = -65536;")  # 64 MiB
+        self.cursor.execute("PRAGMA temp_store = MEMORY;")
+        self.cursor.execute("PRAGMA mmap_size = 268435456;")  # 256 MiB
+
+        # The scan, page query and GUI threads each have their own connection,
+        # so wait for another's write to finish rather than failing with
+        # "database is locked"
+        self.set_busy_timeout(busy_timeout)
+
         # Pagination
         self.page_number = 1
         self.num_pages = 1
         self.hashes_per_page = 10
 
+        # First duplicate hash on each page, for keyset pagination
+        self.page_start_hashes = []
+
+        # Photos deleted through this connection since pop_removed_photos was
+        # last called, as (filepath, hash, mtime, content_hash) tuples
+        self.removed_photos = []
+
+    def set_busy_timeout(self, busy_timeout):
+        """Set how long to wait for another connection's write to finish.
+
+        Args:
+            busy_timeout: Milliseconds to wait before failing with
+                sqlite3.OperationalError ("database is locked").
+        """
+        self.cursor.execute(f"PRAGMA busy_timeout = {int(busy_timeout)};")
+
     def create_db(self):
         """Create the photos table if it doesn't already exist.
 
-        Creates a table named 'photos' with three columns:
+        Creates a table named 'photos' with nine columns:
         - filepath: TEXT PRIMARY KEY (unique file path)
-        - hash: TEXT NOT NULL (MD5 hash of the file)
+        - hash: TEXT NOT NULL (perceptual hash of the file)
         - lastseen: DATETIME (datetime of when a file was last indexed)
+        - device: INTEGER (ID of the device the file is on)
+        - inode: INTEGER (inode number of the file)
+        - mtime: INTEGER (modification time of the file, in nanoseconds)
+        - size: INTEGER (size of the file, in bytes)
+        - prehash: BLOB (16-byte fingerprint of the file's size and ends)
+        - content_hash: BLOB (16-byte hash of the whole file, only stored for
+          files that have shared a prehash with another file)
+
+        The columns after lastseen are added to databases created by older
+        versions. (device, inode, mtime, size) and prehash are indexed so that
+        already-hashed files can be looked up by either. The signature index
+        of older versions, which didn't include the device, is replaced. (hash,
+        filepath) is indexed so that duplicate groups can be paged through in
+        hash order without reading the whole table.
 
         This method is safe to call multiple times as it uses
         CREATE TABLE IF NOT EXISTS.
         """
         try:
+            # Rows are stored by SQLite's implicit integer rowid, which is what
+            # the secondary indexes below point to, so they stay small. The
+            # filepath key has its own index, used by path lookups and joins.
             self.cursor.execute(
                 """
                 CREATE TABLE IF NOT EXISTS photos (
                     filepath TEXT PRIMARY KEY,
                     hash TEXT NOT NULL,
-                    lastseen DATETIME
+                    lastseen DATETIME,
+                    device INTEGER,
+                    inode INTEGER,
+                    mtime INTEGER,
+                    size INTEGER,
+                    prehash BLOB,
+                    content_hash BLOB
                 );
                 """
             )
+
+            # Add the columns introduced after the first version to older databases
+            self.cursor.execute("PRAGMA table_info(photos);")
+            columns = {row[1] for row in self.cursor.fetchall()}
+            for column, column_type in (
+                ("device", "INTEGER"),
+                ("inode", "INTEGER"),
+                ("mtime", "INTEGER"),
+                ("size", "INTEGER"),
+                ("prehash", "BLOB"),
+                ("content_hash", "BLOB"),
+            ):
+                if column not in columns:
+                    self.cursor.execute(
+                        f"ALTER TABLE photos ADD COLUMN {column} {column_type};"
+                    )
+
+            # Inode numbers are only unique within a device, so replace the
+            # signature index of older versions, which had no device column
+            self.cursor.execute("PRAGMA index_info(photos_signature);")
+            if "device" not in {row[2] for row in self.cursor.fetchall()}:
+                self.cursor.execute("DROP INDEX IF EXISTS photos_signature;")
+            self.cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS photos_signature
+                ON photos (device, inode, mtime, size);
+                """
+            )
+            self.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS photos_prehash ON photos (prehash);"
+            )
+            self.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS photos_hash ON photos (hash, filepath);"
+            )
+            self.connection.commit()
         except sqlite3.IntegrityError as e:
             print(f"Error creating database: {e}")
             raise
@@ -64,12 +155,13 @@ class Database:
         Queries the database for all duplicate photo groups (hashes that appear
         more than once), calculates the total number of pages based on
         hashes_per_page, and updates the page_number to ensure it doesn't exceed
-        the total number of pages.
+        the total number of pages. The first hash of every page is kept so that
+        query_database can seek straight to it.
         """
         try:
-            # Grab the duplicate photos, grouped by hash
+            # Grab the hashes of the duplicate photos
             self.cursor.execute(
-                """SELECT hash, GROUP_CONCAT(filepath)
+                """SELECT hash
                 FROM photos
                 WHERE """
                 + " OR ".join(["filepath LIKE ?"] * len(directories_to_scan))
@@ -81,18 +173,19 @@ class Database:
                 tuple(str(directory) + "%" for directory in directories_to_scan),
             )
 
-            # Get all the rows
-            rows = self.cursor.fetchall()
+            # Get all the hashes
+            hashes = [row[0] for row in self.cursor.fetchall()]
 
             # Calculate the number of pages for pagination
-            self.num_pages = math.ceil(len(rows) / self.hashes_per_page)
+            self.num_pages = math.ceil(len(hashes) / self.hashes_per_page)
             self.page_number = min(1, self.num_pages)
+            self.page_start_hashes = hashes[:: self.hashes_per_page]
         except sqlite3.IntegrityError as e:
             print(f"Error updating number of pages: {e}")
             raise
 
     def query_database(self, directories_to_scan):
-        """Retrieve all duplicate photos grouped by their hash.
+        """Retrieve the duplicate photos on the current page, ordered by hash.
 
         Args:
             directories_to_scan: List of directory paths to filter duplicates by.
@@ -101,31 +194,56 @@ class Database:
 
         Returns:
             List of tuples, where each tuple contains:
-            - hash: The MD5 hash that appears multiple times
-            - filepaths: Comma-separated string of file paths with that hash
+            - hash: The perceptual hash that appears multiple times
+            - filepath: Path of a photo with that hash
+            - content_hash: Hash of the photo's whole contents, or None if it
+              hasn't been hashed
+            Rows with the same hash are adjacent, so they can be grouped with
+            itertools.groupby.
 
         Only returns hashes that appear more than once in the database,
         effectively identifying duplicate photos. Results are paginated based
-        on the current page_number and hashes_per_page settings.
+        on the current page_number and hashes_per_page settings. Rather than
+        skipping past the earlier pages with OFFSET, the query starts at the
+        page's first hash, found by update_num_pages.
         """
+        # There are no duplicates to show
+        if not self.page_start_hashes:
+            return []
+
         try:
-            # Grab the duplicate photos, grouped by hash
+            directories_filter = " OR ".join(
+                ["filepath LIKE ?"] * len(directories_to_scan)
+            )
+            directory_patterns = tuple(
+                str(directory) + "%" for directory in directories_to_scan
+            )
+
+            # Grab the duplicate photos on the page, one row per photo
             self.cursor.execute(
-                """SELECT hash, GROUP_CONCAT(filepath)
+                """WITH page AS (
+                    SELECT hash
+                    FROM photos
+                    WHERE hash >= ? AND ("""
+                + directories_filter
+                + """)
+                    GROUP BY hash
+                    HAVING COUNT(*) > 1
+                    ORDER BY hash
+                    LIMIT ?
+                )
+                SELECT hash, filepath, content_hash
                 FROM photos
-                WHERE """
-                + " OR ".join(["filepath LIKE ?"] * len(directories_to_scan))
-                + """
-                GROUP BY hash
-                HAVING COUNT(*) > 1
-                ORDER BY hash
-                LIMIT ?
-                OFFSET ?
+                WHERE hash IN (SELECT hash FROM page) AND ("""
+                + directories_filter
+                + """)
+                ORDER BY hash, filepath
                 """,
                 (
-                    *(str(directory) + "%" for directory in directories_to_scan),
+                    self.page_start_hashes[self.page_number - 1],
+                    *directory_patterns,
                     self.hashes_per_page,
-                    (self.page_number - 1) * self.hashes_per_page,
+                    *directory_patterns,
                 ),
             )
 
@@ -144,16 +262,15 @@ class Database:
 
         Raises:
             sqlite3.IntegrityError: If the deletion operation fails.
+
+        The deleted photos are added to removed_photos.
         """
         if not filepaths:
             return
 
         try:
             placeholders = ",".join("?" * len(filepaths))
-            self.cursor.execute(
-                f"DELETE FROM photos WHERE filepath IN ({placeholders});",
-                list(filepaths),
-            )
+            self._delete_where(f"filepath IN ({placeholders})", list(filepaths))
             self.connection.commit()
         except sqlite3.IntegrityError as e:
             print(f"Error deleting entries from database: {e}")
@@ -173,6 +290,8 @@ class Database:
 
         Raises:
             sqlite3.IntegrityError: If the deletion operation fails.
+
+        The deleted photos are added to removed_photos.
         """
         placeholders = tuple(
             item
@@ -182,60 +301,355 @@ class Database:
         filepaths_lastseen_condition = " OR ".join(
             ["(filepath LIKE ? AND lastseen < ?)"] * len(directories_to_scan)
         )
+        try:
+            self._delete_where(filepaths_lastseen_condition, placeholders)
+            self.connection.commit()
+        except sqlite3.IntegrityError as e:
+            print(f"Error deleting stale entries from database: {e}")
+            raise
+
+    def _delete_where(self, condition, parameters=()):
+        """
+        Delete the photos matching a condition, remembering what they were.
+
+        Args:
+            condition: SQL expression selecting the rows of photos to delete.
+            parameters: Values for the placeholders in condition.
+
+        The deleted rows are added to removed_photos, so that their cached
+        thumbnails can be removed. The caller commits the transaction.
+        """
+        self.cursor.execute(
+            "SELECT filepath, hash, mtime, content_hash FROM photos WHERE "
+            + condition
+            + ";",
+            parameters,
+        )
+        removed_photos = self.cursor.fetchall()
+        self.cursor.execute("DELETE FROM photos WHERE " + condition + ";", parameters)
+        self.removed_photos.extend(removed_photos)
+
+    def pop_removed_photos(self):
+        """
+        Get the photos deleted through this connection, and forget them.
+
+        Returns:
+            list: (filepath, hash, mtime, content_hash) tuples, one for each
+            photo deleted since the last call.
+        """
+        removed_photos = self.removed_photos
+        self.removed_photos = []
+        return removed_photos
+
+    def update_lastseen_and_get_new_filepaths(self, file_signatures, timestamp):
+        """
+        Mark the unchanged indexed photos as seen and return the photos to hash.
+
+        Args:
+            file_signatures: Dict mapping the file paths found by a scan to
+                their (device, inode, mtime, size) tuples, as returned by
+                Finder.get_file_signatures.
+            timestamp: The new timestamp to set for 'lastseen'.
+
+        Returns:
+            list: The filepaths that aren't in the database yet, in the order
+            they were given. This includes the filepaths whose file has been
+            modified since it was hashed, which are removed from the database
+            and added to removed_photos.
+
+        A file whose mtime and size still match its row is assumed unchanged,
+        so its hash is kept without reading the file. Rows indexed by older
+        versions, which have no mtime or size, are given the file's current
+        signature instead of being hashed again.
+
+        The files are loaded into a temporary table, so that SQLite can
+        update the existing rows and find the new filepaths with a join against
+        the primary key, instead of binding one parameter per file or loading
+        every indexed filepath into memory.
+        """
         try:
             self.cursor.execute(
-                "DELETE FROM photos WHERE " + filepaths_lastseen_condition + ";",
-                placeholders,
+                """
+                CREATE TEMP TABLE IF NOT EXISTS scanned_files (
+                    filepath TEXT PRIMARY KEY,
+                    device INTEGER,
+                    inode INTEGER,
+                    mtime INTEGER,
+                    size INTEGER
+                );
+                """
+            )
+            self.cursor.execute("DELETE FROM scanned_files;")
+            self.cursor.executemany(
+                """INSERT INTO scanned_files (filepath, device, inode, mtime, size)
+                VALUES (?, ?, ?, ?, ?);""",
+                (
+                    (filepath, *signature)
+                    for filepath, signature in file_signatures.items()
+                ),
+            )
+
+            # Remove the rows of files that have changed since they were hashed
+            self._delete_where(
+                """rowid IN (
+                    SELECT photos.rowid
+                    FROM scanned_files
+                    JOIN photos ON photos.filepath = scanned_files.filepath
+                    WHERE photos.mtime != scanned_files.mtime
+                    OR photos.size != scanned_files.size
+                )"""
+            )
+
+            # Fill in the signatures of rows indexed before they were stored
+            self.cursor.execute(
+                """
+                UPDATE photos SET (device, inode, mtime, size) = (
+                    SELECT device, inode, mtime, size FROM scanned_files
+                    WHERE scanned_files.filepath = photos.filepath
+                )
+                WHERE device IS NULL
+                AND filepath IN (SELECT filepath FROM scanned_files);
+                """
+            )
+
+            # Batch update all remaining rows with the current timestamp
+            self.cursor.execute(
+                """
+                UPDATE photos SET lastseen = ?
+                WHERE filepath IN (SELECT filepath FROM scanned_files);
+                """,
+                (timestamp,),
             )
+
+            # Get the filepaths that aren't in the database
+            self.cursor.execute(
+                """
+                SELECT filepath FROM scanned_files
+                WHERE filepath NOT IN (SELECT filepath FROM photos)
+                ORDER BY rowid;
+                """
+            )
+            new_filepaths = [row[0] for row in self.cursor.fetchall()]
+
+            self.cursor.execute("DELETE FROM scanned_files;")
             self.connection.commit()
+            return new_filepaths
         except sqlite3.IntegrityError as e:
-            print(f"Error deleting stale entries from database: {e}")
+            print(f"Error updating lastseen in database: {e}")
             raise
 
-    def get_existing_filepaths(self, filepaths):
+    def get_photos_by_signature(self, signatures):
         """
-        Get a set of filepaths that already exist in the database.
+        Get the hashes of already-indexed photos with the given file signatures.
 
         Args:
-            filepaths: List of file paths to check.
+            signatures: Iterable of (device, inode, mtime, size) tuples to look
+                up.
 
         Returns:
-            set: Set of filepaths that exist in the database.
+            dict: Maps each signature found in the database to a
+            (hash, prehash, content_hash) tuple.
         """
-        if not filepaths:
-            return set()
+        signatures = list(signatures)
+        if not signatures:
+            return {}
+
+        # Four parameters per signature; stay well under SQLite's limit
+        chunk_size = 225
+        photos = {}
+        try:
+            for i in range(0, len(signatures), chunk_size):
+                chunk = signatures[i : i + chunk_size]
+                placeholders = ",".join(["(?, ?, ?, ?)"] * len(chunk))
+                self.cursor.execute(
+                    "SELECT device, inode, mtime, size, hash, prehash, content_hash "
+                    "FROM photos WHERE (device, inode, mtime, size) "
+                    f"IN (VALUES {placeholders});",
+                    [item for signature in chunk for item in signature],
+                )
+                for row in self.cursor.fetchall():
+                    photos[row[:4]] = row[4:]
+            return photos
+        except sqlite3.IntegrityError as e:
+            print(f"Error getting hashes by signature from database: {e}")
+            raise
+
+    def get_photos_by_prehash(self, prehashes):
+        """
+        Get the already-indexed photos with the given prehashes.
+
+        Args:
+            prehashes: Iterable of prehash values to look up.
+
+        Returns:
+            dict: Maps each prehash found in the database to a list of
+            (filepath, hash, mtime, size, content_hash) tuples, one for each
+            photo with that prehash.
+
+        A shared prehash doesn't prove that two files are copies, so the
+        photos are returned with their content hashes, and the mtime and size
+        needed to tell whether a content hash computed now still matches the
+        stored hash.
+        """
+        prehashes = list(prehashes)
+        if not prehashes:
+            return {}
 
-        placeholders = ",".join("?" * len(filepaths))
+        chunk_size = 900
+        photos = {}
+        try:
+            for i in range(0, len(prehashes), chunk_size):
+                chunk = prehashes[i : i + chunk_size]
+                placeholders = ",".join("?" * len(chunk))
+                self.cursor.execute(
+                    "SELECT prehash, filepath, hash, mtime, size, content_hash "
+                    f"FROM photos WHERE prehash IN ({placeholders});",
+                    chunk,
+                )
+                for prehash, *photo in self.cursor.fetchall():
+                    photos.setdefault(prehash, []).append(tuple(photo))
+            return photos
+        except sqlite3.IntegrityError as e:
+            print(f"Error getting photos by prehash from database: {e}")
+            raise
+
+    def get_unfingerprinted_filepaths(self, timestamp):
+        """
+        Get the photos seen by a scan that don't have a prehash.
+
+        Args:
+            timestamp: The 'lastseen' timestamp set by the scan.
+
+        Returns:
+            list: The filepaths of the photos last seen at timestamp whose
+            prehash is NULL, as they were indexed before prehashes were stored.
+        """
         try:
             self.cursor.execute(
-                f"SELECT filepath FROM photos WHERE filepath IN ({placeholders});",
-                list(filepaths),
+                """
+                SELECT filepath FROM photos
+                WHERE lastseen = ? AND prehash IS NULL;
+                """,
+                (timestamp,),
             )
-            return {row[0] for row in self.cursor.fetchall()}
+            return [row[0] for row in self.cursor.fetchall()]
         except sqlite3.IntegrityError as e:
-            print(f"Error getting existing rows from database: {e}")
+            print(f"Error getting unfingerprinted photos from database: {e}")
             raise
 
-    def batch_update_lastseen(self, filepaths, timestamp):
+    def update_prehashes(self, prehashes):
         """
-        Batch update the 'lastseen' timestamp for multiple photos.
+        Store the prehashes of already-indexed photos.
 
         Args:
-            filepaths: List of file paths to update.
-            timestamp: The new timestamp to set for 'lastseen'.
+            prehashes: Dict mapping file paths to their prehashes.
+
+        Raises:
+            sqlite3.IntegrityError: If the update operation fails.
         """
-        if not filepaths:
+        if not prehashes:
             return
 
-        placeholders = ",".join("?" * len(filepaths))
         try:
-            self.cursor.execute(
-                f"UPDATE photos SET lastseen = ? WHERE filepath IN ({placeholders});",
-                [timestamp] + list(filepaths),
+            self.cursor.executemany(
+                "UPDATE photos SET prehash = ? WHERE filepath = ?;",
+                ((prehash, filepath) for filepath, prehash in prehashes.items()),
             )
             self.connection.commit()
         except sqlite3.IntegrityError as e:
-            print(f"Error updating lastseen in database: {e}")
+            print(f"Error updating prehashes in database: {e}")
+            raise
+
+    def update_content_hashes(self, content_hashes):
+        """
+        Store the content hashes of already-indexed photos.
+
+        Args:
+            content_hashes: Dict mapping file paths to their content hashes.
+
+        Raises:
+            sqlite3.IntegrityError: If the update operation fails.
+        """
+        if not content_hashes:
+            return
+
+        try:
+            self.cursor.executemany(
+                "UPDATE photos SET content_hash = ? WHERE filepath = ?;",
+                (
+                    (content_hash, filepath)
+                    for filepath, content_hash in content_hashes.items()
+                ),
+            )
+            self.connection.commit()
+        except sqlite3.IntegrityError as e:
+            print(f"Error updating content hashes in database: {e}")
+            raise
+
+    def get_unduplicated_photos(self, hashes):
+        """
+        Get the photos that are the only ones left with one of the given hashes.
+
+        Args:
+            hashes: Iterable of hash values to look up.
+
+        Returns:
+            list: (filepath, mtime, content_hash) tuples, one for each hash
+            that only one photo in the database has, in any directory.
+        """
+        hashes = list(hashes)
+        chunk_size = 900
+        photos = []
+        try:
+            for i in range(0, len(hashes), chunk_size):
+                chunk = hashes[i : i + chunk_size]
+                placeholders = ",".join("?" * len(chunk))
+                self.cursor.execute(
+                    "SELECT filepath, mtime, content_hash FROM photos "
+                    f"WHERE hash IN ({placeholders}) "
+                    "GROUP BY hash HAVING COUNT(*) = 1;",
+                    chunk,
+                )
+                photos.extend(self.cursor.fetchall())
+            return photos
+        except sqlite3.IntegrityError as e:
+            print(f"Error getting unduplicated photos from database: {e}")
+            raise
+
+    def get_duplicated_content_hashes(self, content_hashes):
+        """
+        Get which of the given content hashes a photo with a duplicate has.
+
+        Args:
+            content_hashes: Iterable of content hash values to look up.
+
+        Returns:
+            set: The content hashes of photos whose hash appears more than once
+            in the database, in any directory.
+        """
+        content_hashes = list(content_hashes)
+        chunk_size = 900
+        duplicated = set()
+        try:
+            for i in range(0, len(content_hashes), chunk_size):
+                chunk = content_hashes[i : i + chunk_size]
+                placeholders = ",".join("?" * len(chunk))
+                self.cursor.execute(
+                    f"""
+                    SELECT DISTINCT content_hash FROM photos
+                    WHERE content_hash IN ({placeholders})
+                    AND EXISTS (
+                        SELECT 1 FROM photos AS other
+                        WHERE other.hash = photos.hash
+                        AND other.filepath != photos.filepath
+                    );
+                    """,
+                    chunk,
+                )
+                duplicated.update(row[0] for row in self.cursor.fetchall())
+            return duplicated
+        except sqlite3.IntegrityError as e:
+            print(f"Error getting duplicated content hashes from database: {e}")
             raise
 
     def batch_insert_new_photos(self, photo_data):
@@ -243,14 +657,22 @@ class Database:
         Batch insert multiple new photos into the database.
 
         Args:
-            photo_data: List of tuples, each containing (filepath, hash, timestamp).
+            photo_data: List of tuples, each containing (filepath, hash,
+                timestamp, device, inode, mtime, size, prehash, content_hash).
+
+        All rows are inserted in a single transaction. Rows whose filepath is
+        already in the database are skipped, rather than failing the whole
+        batch.
         """
         if not photo_data:
             return
 
         try:
             self.cursor.executemany(
-                "INSERT INTO photos VALUES (?, ?, ?);",
+                """INSERT OR IGNORE INTO photos
+                (filepath, hash, lastseen, device, inode, mtime, size, prehash,
+                content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);""",
                 photo_data,
             )
             self.connection.commit()
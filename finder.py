@@ -1,7 +1,8 @@
-"""Photo file discovery and hashing functionality.
+"""Photo file discovery and filesystem operations.
 
-This module provides the Finder class for locating photo files in a directory,
-computing MD5 hashes to identify duplicates, and managing file deletion operations.
+This module provides the Finder class for locating photo files in directories,
+collecting the file metadata used to recognise already-hashed photos, and
+managing file deletion operations.
 """
 
 import os
@@ -22,7 +23,7 @@ class Finder:
         """
         # self.directory_to_scan = directory_to_scan or Path.home()
         self.directories_to_scan = directories_to_scan or [Path.home()]
-        self.valid_image_extensions = {".png", ".jpg", ".jpeg", ".gif", ".bmp"}
+        self.valid_image_extensions = (".png", ".jpg", ".jpeg", ".gif", ".bmp")
         self.database = database
 
     def find_photo_filepaths(self):
@@ -30,29 +31,67 @@ class Finder:
 
         Returns:
             List of file paths to image files found in the directories and
-            all subdirectories. Only files with supported image extensions
-            (.png, .jpg, .jpeg, .gif, .bmp) are included.
-
-        Recursively walks through each directory tree and collects paths
-        to all files matching the valid image extensions.
+            all subdirectories, sorted into on-disk order. Only files with
+            supported image extensions (.png, .jpg, .jpeg, .gif, .bmp) are
+            included.
+
+        Recursively walks through each directory tree with os.scandir and
+        collects paths to all files matching the valid image extensions. The
+        inode of each file comes for free with its directory entry, so the
+        paths are sorted by (device, inode), which approximates the physical
+        layout of files on disk. Reading files in this order reduces seeking
+        on spinning disks and network mounts. The directory entry of a
+        symlinked photo has the link's own inode, which may be on another
+        device than the photo, so symlinks are stat'd to sort them by the
+        photo they point to, as get_file_signatures does. Broken symlinks are
+        skipped. Symlinked directories are not followed, and unreadable
+        directories are skipped, as with os.walk.
         """
-        filepaths = []
+        devices_inodes_and_filepaths = []
+        valid_image_extensions = self.valid_image_extensions
 
         # Recursively walk through directories and subdirectories
-        for directory in self.directories_to_scan:
-            for root, _, files in os.walk(directory):
-                for filename in files:
-                    # Check if file has a supported image extension
-                    file_ext = os.path.splitext(filename)[1].lower()
-                    if file_ext not in self.valid_image_extensions:
-                        continue
-
-                    # Get the full file path
-                    filepath = os.path.join(root, filename)
-
-                    filepaths.append(filepath)
-
-        return filepaths
+        directories = list(self.directories_to_scan)
+        while directories:
+            directory = directories.pop()
+            try:
+                device = os.stat(directory).st_dev
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        # Queue up subdirectories to be walked
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            is_dir = False
+                        if is_dir:
+                            if not entry.is_symlink():
+                                directories.append(entry.path)
+                            continue
+
+                        # Check if file has a supported image extension. endswith()
+                        # checks the whole tuple in C, without splitting the name.
+                        if not entry.name.lower().endswith(valid_image_extensions):
+                            continue
+
+                        # Sort symlinked photos by the file they point to
+                        if entry.is_symlink():
+                            try:
+                                stat_result = entry.stat()
+                            except OSError:
+                                continue
+                            devices_inodes_and_filepaths.append(
+                                (stat_result.st_dev, stat_result.st_ino, entry.path)
+                            )
+                            continue
+
+                        devices_inodes_and_filepaths.append(
+                            (device, entry.inode(), entry.path)
+                        )
+            except OSError:
+                continue
+
+        devices_inodes_and_filepaths.sort()
+        return [filepath for _, _, filepath in devices_inodes_and_filepaths]
 
     def delete_selected_photos(self, filepaths):
         """Delete photo files from the filesystem.
@@ -76,3 +115,36 @@ class Finder:
 
             else:
                 print(f"File not found, skipping: {filepath}")
+
+    def get_file_signatures(self, filepaths):
+        """Stat files and collect the metadata that identifies their contents.
+
+        Args:
+            filepaths: List of file paths to stat.
+
+        Returns:
+            dict: Maps each file path to a (device, inode, mtime, size) tuple,
+            where mtime is in nanoseconds. Files that can no longer be stat'd are
+            left out. The dict preserves the order of filepaths.
+
+        An unchanged file keeps its inode, mtime and size when it is renamed or
+        moved within the same filesystem, so the signature can be used to
+        recognise files that have already been hashed under another path.
+        Inode numbers are only unique within one filesystem, and some, such as
+        the FAT filesystems of camera memory cards, assign them afresh on
+        every mount, so the device is part of the signature too.
+        """
+        file_signatures = {}
+        for filepath in filepaths:
+            try:
+                stat_result = os.stat(filepath)
+            except OSError:
+                continue
+            file_signatures[filepath] = (
+                stat_result.st_dev,
+                stat_result.st_ino,
+                stat_result.st_mtime_ns,
+                stat_result.st_size,
+            )
+
+        return file_signatures
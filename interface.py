@@ -4,28 +4,51 @@ This module provides the Interface class which creates and manages a Tkinter-bas
 GUI for displaying duplicate photos, scanning directories, and managing photo deletion.
 """
 
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import OrderedDict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
 from datetime import datetime
+from hashlib import sha1
+from itertools import groupby, islice
+from multiprocessing import get_context
+from operator import itemgetter
 from os import cpu_count
 from pathlib import Path
-from sqlite3 import IntegrityError
+from queue import Empty, Queue
+from sqlite3 import IntegrityError, OperationalError
+from threading import Thread
+from time import monotonic
 from tkinter import E, N, S, StringVar, TclError, Tk, W, messagebox, ttk
 
-from PIL import Image, ImageTk
+from PIL import Image, ImageOps, ImageTk
 from tkfilebrowser import askopendirnames
 from tktooltip import ToolTip
 
-from widgets import OutlinedFrame, VerticalScrollFrame
+from database import Database
+from hasher import dhash_batch_in_worker, init_worker
+from widgets import OutlinedFrame, ThumbnailCanvas
+
+try:
+    import pyvips
+except (ImportError, OSError):
+    # pyvips is optional. It also fails to import if libvips isn't installed.
+    pyvips = None
 
 
 class Interface:
-    def __init__(self, database, finder, hasher):
+    def __init__(self, database, finder, hasher, thumbnail_cache_dir):
         """Initialize the Interface and start the GUI application.
 
         Args:
             database: Database instance for accessing photo data.
             finder: Finder instance for scanning photos.
             hasher: Hasher instance for hashing photos.
+            thumbnail_cache_dir: Path of the directory to store generated
+                thumbnails in.
 
         Creates the Tkinter root window, builds the GUI layout, populates
         initial thumbnails, and starts the main event loop.
@@ -33,31 +56,99 @@ class Interface:
         self.finder = finder
         self.database = database
         self.hasher = hasher
+
+        # SQLite is only used on the query and scan threads, whose connections
+        # wait up to a minute for each other's writes. The Tk thread's own
+        # connection only waits briefly, so that a call made on it by mistake
+        # can't freeze the GUI while a scan holds the write lock.
+        self.database.set_busy_timeout(1000)
         self._debounce_running = None
+        self._debounce_call = None
+        self._debounce_last_call_time = 0.0
+        self._render_running = None
 
         # Number of columns the thumbnails should take up at max
         self.thumbnails_cols = 4
 
-        # Reference to each hash's thumbnail objects, to prevent garbage collection
-        self.hash_and_thumbnails = {}
+        # Maximum width and height of a thumbnail, in pixels
+        self.thumbnail_size = 200
+
+        # Content hashes of the photos on the current page, by filepath
+        self.thumbnail_content_hashes = {}
+
+        # Thumbnails are keyed by content hash, so that byte-identical copies
+        # share a single decode and PhotoImage, or by filepath for photos
+        # without a content hash. The key of each photo on the current page,
+        # and the photos sharing each key.
+        self.thumbnail_keys = {}
+        self.thumbnail_key_filepaths = {}
+
+        # Recently shown thumbnail objects by key, least recent first.
+        # Keeping a reference prevents garbage collection. At up to 160 KB
+        # each, 400 thumbnails cap the cache at about 64 MB while holding a
+        # few pages, so flipping back to a recent page doesn't decode again.
+        self.thumbnail_cache = OrderedDict()
+        self.thumbnail_cache_size = 400
+
+        # PhotoImages evicted from the cache, by (mode, size). New thumbnails
+        # of the same mode and size are pasted into them, rather than having
+        # Tk allocate a new image for every thumbnail scrolled into view.
+        self.spare_thumbnails = {}
+        self.num_spare_thumbnails = 0
+        self.max_spare_thumbnails = 40
+
+        # Number of thumbnails in view, which are never evicted from the cache
+        self.num_visible_thumbnails = 0
+
+        # Generated thumbnails are saved here, so they needn't be made again
+        self.thumbnail_cache_dir = thumbnail_cache_dir
+
+        # Thread pool that decodes thumbnails, and the filepaths it's working on.
+        # A page only shows a few dozen thumbnails, so more than 8 threads would
+        # just compete with the hashing processes during a scan.
+        self.thumbnail_executor = ThreadPoolExecutor(
+            max_workers=min(8, cpu_count() or 1)
+        )
+        self.decoding_thumbnails = set()
+
+        # Bumped whenever the thumbnail cache is cleared, so that decodes
+        # submitted before then are dropped when they finish
+        self.thumbnail_generation = 0
 
         # Set of selected thumbnails
         self.selected_filepaths = set()
 
-        # List of Tooltip objects
-        self.tooltips = []
+        # Calls queued by background threads, to be run on the Tk main thread
+        self.main_thread_calls = Queue()
+
+        # Latest status text posted by a background thread, and whether a call
+        # to show it is already queued
+        self.posted_scanning_text = None
+        self.scanning_text_call_queued = False
+
+        # Database calls for the query thread, which keeps SQLite off the Tk
+        # thread
+        self.query_requests = Queue()
+        Thread(target=self._query_worker, daemon=True).start()
 
         # Instantiate the Tk root window
         self.tk_root = Tk()
 
-        # Update the database pagination info
-        self.database.update_num_pages(self.finder.directories_to_scan)
-
         # Create the GUI
         self.create_gui()
 
-        # Fill the thumbnails frame with duplicate thumbnails
-        self.display_thumbnails()
+        # Load thumbnails as they scroll into view
+        self.thumbnails_container.bind(
+            "<<ViewChanged>>", self.schedule_render_visible_thumbnails
+        )
+
+        # Count the pages of duplicates and fill the thumbnails frame with
+        # the first one
+        self.refresh_pages(page_number=1)
+        self.update_scanning_text("0 photos selected")
+
+        # Start running calls posted by background threads
+        self._process_main_thread_calls()
 
         # Spin up the GUI
         self.tk_root.mainloop()
@@ -101,9 +192,16 @@ class Interface:
         )
         self.delete_button.grid(column=3, row=0, sticky=E)
 
-        # Frame that holds the thumbnails. Stretch it in all directions.
-        self.thumbnails_container = VerticalScrollFrame(
-            main_frame, width=1000, height=500, relief="ridge", borderwidth=2
+        # Canvas that holds the thumbnails. Stretch it in all directions.
+        self.thumbnails_container = ThumbnailCanvas(
+            main_frame,
+            self.thumbnail_size,
+            self.thumbnails_cols,
+            self.toggle_filepath_selection,
+            width=1000,
+            height=500,
+            relief="ridge",
+            borderwidth=2,
         )
         self.thumbnails_container.grid(column=0, row=1, sticky=(N, S, E, W))
         self.thumbnails_container.columnconfigure(0, weight=1)
@@ -187,27 +285,26 @@ class Interface:
 
             # TODO: update text, a la other TODO
             num_dirs = len(self.finder.directories_to_scan)
-            self.directory_to_scan_text.set(
-                value=(
-                    f"{num_dirs} folder{'' if num_dirs == 1 else 's'} selected "
-                    "(hover for more)"
-                )
+            text = (
+                f"{num_dirs} folder{'' if num_dirs == 1 else 's'} selected "
+                "(hover for more)"
             )
-            msg = "\n".join(
+            if text != self.directory_to_scan_text.get():
+                self.directory_to_scan_text.set(value=text)
+
+            # Point the existing tooltip at the new list of dirs
+            self.directory_to_scan_tooltip.msg = "\n".join(
                 str(directory) for directory in self.finder.directories_to_scan
             )
-            self.directory_to_scan_tooltip.destroy()
-            self.directory_to_scan_tooltip = ToolTip(
-                self.directory_to_scan_label, msg=msg
-            )
-            self.tk_root.update()
 
     def _debounce(self, delay, fn, args=None, kwargs=None):
         """
         Debounce the execution of a function by delaying it for a given time.
 
         If another call to _debounce occurs before the delay has finished,
-        the previous scheduled call is cancelled and replaced by the new one.
+        the new call replaces the pending one and the delay starts over. The
+        pending timer isn't cancelled; when it fires early, it reschedules
+        itself for the remaining time, so a burst of calls costs one timer.
 
         Args:
             delay (int): Delay in milliseconds before fn is called.
@@ -215,44 +312,36 @@ class Interface:
             args (list or None): Positional arguments to pass to fn.
             kwargs (dict or None): Keyword arguments to pass to fn.
         """
-        if self._debounce_running is not None:
-            self.tk_root.after_cancel(self._debounce_running)
+        self._debounce_call = (delay, fn, args, kwargs)
+        self._debounce_last_call_time = monotonic()
 
-        self._debounce_running = self.tk_root.after(
-            delay,
-            lambda fn=fn, args=args, kwargs=kwargs: self._call_debounce_fn(
-                fn, args, kwargs
-            ),
-        )
+        if self._debounce_running is None:
+            self._debounce_running = self.tk_root.after(delay, self._call_debounce_fn)
 
-    def _call_debounce_fn(self, fn, args=None, kwargs=None):
+    def _call_debounce_fn(self):
         """
-        Helper for the debounce mechanism: call the target function with arguments,
+        Helper for the debounce mechanism: call the most recently debounced
+        function once its delay has passed since the last call to _debounce,
         then reset the debounce tracking variable.
 
-        Args:
-            fn (callable): The function to call.
-            args (list or None): Positional args to pass to fn (default empty list).
-            kwargs (dict or None): Keyword args to pass to fn (default empty dict).
+        If _debounce was called again while waiting, nothing is called yet and
+        the timer is rescheduled for the rest of the delay.
         """
+        delay, fn, args, kwargs = self._debounce_call
+        elapsed = (monotonic() - self._debounce_last_call_time) * 1000
+        if elapsed < delay:
+            self._debounce_running = self.tk_root.after(
+                int(delay - elapsed) + 1, self._call_debounce_fn
+            )
+            return
+
+        self._debounce_running = None
         if args is None:
             args = []
         if kwargs is None:
             kwargs = {}
 
         fn(*args, **kwargs)
-        self._debounce_running = None
-
-    def destroy_tooltips(self):
-        """Destroy all existing tooltip objects and clear the tooltips list.
-
-        Removes all tooltip widgets that were created for thumbnail labels,
-        preventing memory leaks and ensuring clean state when refreshing
-        the thumbnail display.
-        """
-        for tooltip in self.tooltips:
-            tooltip.destroy()
-        self.tooltips = []
 
     def go_to_prev_page(self):
         """Navigate to the previous page of duplicate photo groups.
@@ -301,13 +390,12 @@ class Interface:
         """Update the pagination label text with current page information.
 
         Sets the label text to show the current page number and total number
-        of pages, then forces a GUI update to reflect the change.
+        of pages. Nothing is done if the text hasn't changed.
         """
         # Update the pagination UI
-        self.num_pages_text.set(
-            f"Page {self.database.page_number} of {self.database.num_pages}"
-        )
-        self.tk_root.update()
+        text = f"Page {self.database.page_number} of {self.database.num_pages}"
+        if text != self.num_pages_text.get():
+            self.num_pages_text.set(text)
 
     def show_delete_confirm_modal(self):
         """Display a confirmation dialog before deleting selected photos.
@@ -333,39 +421,97 @@ class Interface:
     def delete_selected_photos(self):
         """Delete the selected photos from disk and database.
 
-        Removes the selected photo files from the filesystem, deletes their
-        database entries, updates the thumbnail display, and shows a success
-        message. Clears the selection after deletion is complete.
+        Clears the selection and has the query thread remove the selected
+        photo files from the filesystem and delete their database entries, so
+        the GUI isn't blocked on either. The query thread then recounts the
+        pages and shows the current page again, reusing its cached
+        thumbnails, so only groups that changed need any new decoding.
+        _finish_delete() shows a success message once it's done.
         """
-        # Grab the number of selected thumbnails
-        num_photos = len(self.selected_filepaths)
+        # Visually disable the delete button
+        self.delete_button.state(["disabled"])
+        self.update_scanning_text("Deleting photos...")
 
+        # Delete the photos on the query thread, staying on the current page
+        # unless it no longer exists
+        self.query_requests.put(
+            (
+                self._delete_photos,
+                (
+                    list(self.selected_filepaths),
+                    list(self.finder.directories_to_scan),
+                    self.database.page_number,
+                ),
+            )
+        )
+
+        # Clear out the selected photos set
+        self.selected_filepaths.clear()
+
+    def _delete_photos(self, database, filepaths, directories_to_scan, page_number):
+        """Delete photos from disk and database, then show the page again.
+
+        Args:
+            database: Database instance owned by the query thread.
+            filepaths: List of file paths to delete.
+            directories_to_scan: List of directory paths being displayed.
+            page_number: Page to show afterwards, if it still exists.
+
+        Runs on the query thread. _finish_delete() is scheduled on the main
+        thread once the photos are deleted and the page is shown again. If a
+        scan keeps the database locked for too long, the files are still
+        deleted, and _finish_delete() is told that their entries weren't.
+        """
         # Delete the photos from the hard drive
-        self.finder.delete_selected_photos(self.selected_filepaths)
+        self.finder.delete_selected_photos(filepaths)
 
         # Remove the entry from the database
+        database_updated = True
         try:
-            self.database.delete_photos(self.selected_filepaths)
+            database.delete_photos(filepaths)
         except IntegrityError:
             pass
+        except OperationalError as e:
+            print(f"Error deleting entries from database: {e}")
+            database_updated = False
 
-        # Visually disable the delete button
-        self.delete_button.state(["disabled"])
+        # Remove the thumbnails that aren't needed anymore
+        try:
+            self.sweep_thumbnail_cache(database, database.pop_removed_photos())
+        except (IntegrityError, OperationalError) as e:
+            print(f"Error removing cached thumbnails: {e}")
 
-        # Clear out the selected photos set
-        self.selected_filepaths.clear()
+        # Update the database pagination info and the thumbnails
+        self._count_pages(database, directories_to_scan, page_number)
 
-        # Update the database pagination info
-        self.database.update_num_pages(self.finder.directories_to_scan)
+        self.call_in_main_thread(self._finish_delete, len(filepaths), database_updated)
 
-        # Reset the navigation
-        self.database.page_number = 1
-        self.update_prev_next_button_states()
-        self.update_num_pages_label()
+    def _finish_delete(self, num_photos, database_updated=True):
+        """Let the user know that the selected photos have been deleted.
+
+        Args:
+            num_photos: Number of photos that were deleted.
+            database_updated: Whether the photos' database entries were
+                deleted too.
 
-        # Update the thumbnails
-        self.update_scanning_text("Updating thumbnails...")
-        self.display_thumbnails()
+        Runs on the main thread once _delete_photos() is done.
+        """
+        self.update_scanning_text(
+            f"{len(self.selected_filepaths)} "
+            f"photo{'' if len(self.selected_filepaths) == 1 else 's'} selected"
+        )
+
+        # The entries of deleted files are removed by the next scan
+        if not database_updated:
+            messagebox.showwarning(
+                title="Photos Deleted",
+                message=(
+                    f"Deleted {num_photos} photo{'' if num_photos == 1 else 's'}, "
+                    "but the database was busy. Scan again to remove "
+                    f"{'it' if num_photos == 1 else 'them'} from the list."
+                ),
+            )
+            return
 
         # Let the user know that the files have been deleted
         messagebox.showinfo(
@@ -377,73 +523,312 @@ class Interface:
         )
 
     def scan_for_duplicates(self):
-        """Scan for duplicate photos and update the display.
+        """Start scanning for duplicate photos in a background thread.
 
-        Finds all photo files in the configured directory, computes their
-        hashes, stores them in the database, and updates the thumbnail
-        display to show newly found duplicates. Updates the status text
-        throughout the scanning process.
+        Disables the Scan and Select Folders buttons and runs _scan_worker()
+        on a daemon thread, so that the GUI stays responsive while photos are
+        found, hashed and stored. The worker reads the finder's directories,
+        so they mustn't change until it's done. The display is refreshed by
+        _finish_scan() once the scan is complete.
         """
-        # Update the scanning text
+        self.scan_button.state(["disabled"])
+        self.select_directories_button.state(["disabled"])
         self.update_scanning_text("Scanning for photo files...")
 
+        Thread(
+            target=self._scan_worker,
+            args=(list(self.finder.directories_to_scan),),
+            daemon=True,
+        ).start()
+
+    def _scan_worker(self, directories_to_scan):
+        """Scan for duplicate photos and store their hashes in the database.
+
+        Args:
+            directories_to_scan: List of directory paths being scanned.
+
+        Runs on a background thread. Finds all photo files in the configured
+        directories, computes the hashes of new ones and stores them in the
+        database. SQLite connections cannot be shared between threads, so the
+        worker opens its own connection to the database. Tk is not thread-safe
+        either, so status updates are posted to the main thread, and
+        _finish_scan() is scheduled there when the worker is done, even if the
+        scan fails.
+        """
+        database = Database(self.database.db_path)
+        try:
+            self._scan(database, directories_to_scan)
+        except Exception as e:
+            print(f"Error scanning for duplicates: {e}")
+        finally:
+            database.connection.close()
+            self.call_in_main_thread(self._finish_scan, directories_to_scan)
+
+    def _scan(self, database, directories_to_scan):
+        """Find, hash and store the photos in the given directories.
+
+        Args:
+            database: Database instance owned by the calling thread.
+            directories_to_scan: List of directory paths being scanned.
+
+        Updates the status text throughout the scanning process.
+        """
         # Get the filepaths of all photos on the hard drive
         filepaths = self.finder.find_photo_filepaths()
         if not filepaths:
             return
 
-        # Check which filepaths already exist in the database
-        self.update_scanning_text("Checking existing files...")
-        filepaths_in_database = self.database.get_existing_filepaths(filepaths)
+        # Stat the files, so that files changed since they were last hashed
+        # can be told apart from unchanged ones
+        self.post_scanning_text("Checking existing files...")
+        file_signatures = self.finder.get_file_signatures(filepaths)
 
-        # Separate files into existing and new
-        new_filepaths = [fp for fp in filepaths if fp not in filepaths_in_database]
-
-        # Batch update all existing database rows with the current timestamp
+        # Mark the unchanged files already in the database as seen, and get
+        # the rest
         now = datetime.now()
-        if filepaths_in_database:
+        try:
+            new_filepaths = database.update_lastseen_and_get_new_filepaths(
+                file_signatures, now
+            )
+        except IntegrityError:
+            return
+
+        # A new path whose (device, inode, mtime, size) is already in the
+        # database is a renamed or moved file, and can reuse its hash
+        file_signatures = {
+            filepath: file_signatures[filepath] for filepath in new_filepaths
+        }
+        known_photos = database.get_photos_by_signature(set(file_signatures.values()))
+        renamed_photos_data = [
+            (filepath, known_photos[signature][0], now, *signature)
+            + known_photos[signature][1:]
+            for filepath, signature in file_signatures.items()
+            if signature in known_photos
+        ]
+        if renamed_photos_data:
             try:
-                self.database.batch_update_lastseen(filepaths_in_database, now)
+                database.batch_insert_new_photos(renamed_photos_data)
             except IntegrityError:
                 pass
 
-        # Process new files in batches: compute hashes for chunks and batch insert
-        batch_size = 50
-        if new_filepaths:
-            for i in range(0, len(new_filepaths), batch_size):
-                # Update display text
-                self.update_scanning_text(
-                    f"Processing new photos {i}/{len(new_filepaths)}..."
+        # Fingerprint the remaining new files from their size and first and
+        # last bytes. Byte-identical copies share a fingerprint, so only the
+        # files sharing one with another file can be copies. Photos indexed
+        # before fingerprints were stored are fingerprinted too, so that new
+        # copies of them are found.
+        self.post_scanning_text("Fingerprinting new photos...")
+        unknown_filepaths = [
+            filepath
+            for filepath, signature in file_signatures.items()
+            if signature not in known_photos
+        ]
+        try:
+            unfingerprinted_filepaths = database.get_unfingerprinted_filepaths(now)
+        except IntegrityError:
+            unfingerprinted_filepaths = []
+        with ThreadPoolExecutor() as executor:
+            prehashes = dict(executor.map(self.hasher.prehash_file, unknown_filepaths))
+            backfilled_prehashes = dict(
+                executor.map(self.hasher.prehash_file, unfingerprinted_filepaths)
+            )
+        try:
+            database.update_prehashes(
+                {
+                    filepath: prehash
+                    for filepath, prehash in backfilled_prehashes.items()
+                    if prehash
+                }
+            )
+        except IntegrityError:
+            pass
+        indexed_photos = database.get_photos_by_prehash(
+            {prehash for prehash in prehashes.values() if prehash}
+        )
+
+        # Files that only differ between the fingerprinted blocks share a
+        # fingerprint too, so the whole contents of the candidate copies are
+        # hashed to confirm them
+        filepaths_by_prehash = {}
+        for filepath, prehash in prehashes.items():
+            if prehash:
+                filepaths_by_prehash.setdefault(prehash, []).append(filepath)
+        candidate_filepaths = [
+            filepath
+            for prehash, filepaths in filepaths_by_prehash.items()
+            if len(filepaths) > 1 or prehash in indexed_photos
+            for filepath in filepaths
+        ]
+
+        # Indexed photos that haven't had their contents hashed yet are hashed
+        # too, unless they've changed since their dHash was computed
+        unverified_photos = {
+            photo[0]: photo
+            for photos in indexed_photos.values()
+            for photo in photos
+            if photo[4] is None
+        }
+        unverified_filepaths = [
+            filepath
+            for filepath, signature in self.finder.get_file_signatures(
+                list(unverified_photos)
+            ).items()
+            if signature[2:] == unverified_photos[filepath][2:4]
+        ]
+
+        if candidate_filepaths:
+            self.post_scanning_text("Checking for copies of photos...")
+        with ThreadPoolExecutor() as executor:
+            content_hashes = dict(
+                executor.map(
+                    self.hasher.content_hash_file,
+                    candidate_filepaths + unverified_filepaths,
                 )
+            )
+        try:
+            database.update_content_hashes(
+                {
+                    filepath: content_hashes[filepath]
+                    for filepath in unverified_filepaths
+                    if content_hashes[filepath]
+                }
+            )
+        except IntegrityError:
+            pass
+
+        # Their cached thumbnails, keyed by filepath and mtime until now, are
+        # moved to their content hash by sweep_thumbnail_cache
+        rekeyed_photos = [
+            (filepath, unverified_photos[filepath][2], content_hashes[filepath])
+            for filepath in unverified_filepaths
+            if content_hashes[filepath]
+        ]
+
+        # The hashes of the indexed photos, by content hash
+        content_hash_hashes = {
+            photo[4] or content_hashes.get(photo[0]): photo[1]
+            for photos in indexed_photos.values()
+            for photo in photos
+        }
+        content_hash_hashes.pop(None, None)
+
+        def photo_data(filepath, file_hash):
+            return (
+                filepath,
+                file_hash,
+                now,
+                *file_signatures[filepath],
+                prehashes[filepath],
+                content_hashes.get(filepath),
+            )
+
+        # Copies of files that are already in the database reuse their hash
+        copied_photos_data = [
+            photo_data(filepath, content_hash_hashes[content_hashes[filepath]])
+            for filepath in candidate_filepaths
+            if content_hashes[filepath] in content_hash_hashes
+        ]
+        if copied_photos_data:
+            try:
+                database.batch_insert_new_photos(copied_photos_data)
+            except IntegrityError:
+                pass
+
+        # Copies of each other only need one of the files to be hashed. The
+        # files stay in the on-disk order they were found in, so that reads are
+        # as sequential as possible.
+        new_filepaths = []
+        copies = {}
+        first_filepath_by_content_hash = {}
+        for filepath in prehashes:
+            content_hash = content_hashes.get(filepath)
+            if content_hash in content_hash_hashes:
+                continue
+            if content_hash in first_filepath_by_content_hash:
+                copies[first_filepath_by_content_hash[content_hash]].append(filepath)
+                continue
+            if content_hash:
+                first_filepath_by_content_hash[content_hash] = filepath
+            copies[filepath] = []
+            new_filepaths.append(filepath)
+
+        # Hash the new files, streaming the results into the database in large
+        # batches. The worker processes are started once for the whole scan.
+        flush_size = 500
+        if new_filepaths:
+            # Determine optimal number of worker processes
+            # (one per CPU, capped by total files)
+            max_workers = min(cpu_count() or 4, len(new_filepaths))
+            # Spawn fresh worker processes, since forking a process that is
+            # running other threads (including Tk's) is unsafe
+            executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=get_context("spawn"),
+                initializer=init_worker,
+            )
+            try:
+                new_photos_data = []
+                for filepath, file_hash in self.compute_file_hashes_multiprocessing(
+                    executor, max_workers, new_filepaths
+                ):
+                    new_photos_data.extend(
+                        photo_data(copy_filepath, file_hash)
+                        for copy_filepath in [filepath] + copies[filepath]
+                    )
+                    if len(new_photos_data) < flush_size:
+                        continue
 
-                batch = new_filepaths[i : i + batch_size]
-                new_photos_data = self.compute_file_hashes_multiprocessing(batch, now)
-                if new_photos_data:
                     try:
-                        self.database.batch_insert_new_photos(new_photos_data)
+                        database.batch_insert_new_photos(new_photos_data)
                     except IntegrityError:
                         pass
+                    new_photos_data = []
+
+                try:
+                    database.batch_insert_new_photos(new_photos_data)
+                except IntegrityError:
+                    pass
+            finally:
+                executor.shutdown()
 
         # Any records in the database that didn't get their lastseen column updated
         # don't exist on the filesystem anymore. They can be purged.
         try:
-            self.database.delete_stale_photos(self.finder.directories_to_scan, now)
+            database.delete_stale_photos(directories_to_scan, now)
         except IntegrityError:
             pass
 
-        # Update the database pagination info
-        self.database.update_num_pages(self.finder.directories_to_scan)
+        # Remove the thumbnails of the photos that were deleted or are no
+        # longer duplicates, and move those of newly content-hashed photos
+        try:
+            self.sweep_thumbnail_cache(
+                database, database.pop_removed_photos(), rekeyed_photos
+            )
+        except IntegrityError:
+            pass
 
-        # Update the thumbnails
-        self.update_scanning_text("Updating thumbnails...")
-        self.display_thumbnails()
+    def _finish_scan(self, directories_to_scan):
+        """Refresh the display once a background scan has finished.
 
-        # Update the pagination UI
-        self.update_prev_next_button_states()
-        self.update_num_pages_label()
+        Args:
+            directories_to_scan: List of directory paths that were scanned.
+
+        Runs on the main thread. Has the query thread update the pagination
+        info and show the first page with the newly stored hashes, and
+        re-enables the Scan and Select Folders buttons.
+        """
+        # Files may have changed on disk, so don't reuse old thumbnails, even
+        # those still being decoded
+        self.thumbnail_generation += 1
+        self.thumbnail_cache.clear()
+        self.decoding_thumbnails.clear()
+
+        # Update the database pagination info and the thumbnails
+        self.refresh_pages(directories_to_scan, page_number=1)
 
         # Reset the scanning text
         self.update_scanning_text("Scan complete!")
+        self.scan_button.state(["!disabled"])
+        self.select_directories_button.state(["!disabled"])
 
     def update_scanning_text(self, text):
         """
@@ -452,193 +837,501 @@ class Interface:
         Args:
             text (str): The text to display in the scanning status label.
 
-        Updates the StringVar associated with the scanning label and
-        forces a GUI update so the user sees immediate feedback.
+        Updates the StringVar associated with the scanning label. The label
+        is redrawn the next time the main loop is idle, so several updates in
+        a row only cost one redraw. Nothing is done if the text hasn't changed.
         """
-        self.scanning_text.set(text)
-        self.tk_root.update()  # Final GUI update
+        if text != self.scanning_text.get():
+            self.scanning_text.set(text)
 
-    def compute_file_hashes(self, new_filepaths, now):
+    def post_scanning_text(self, text):
         """
-        Compute image hashes for a list of new photo file paths.
+        Update the scanning status text from a background thread.
 
         Args:
-            new_filepaths (list of str): File paths to new photos that need hashing.
-            now (datetime): The datetime to associate as the 'last seen' timestamp.
+            text (str): The text to display in the scanning status label.
 
-        Returns:
-            list of tuples: Each tuple contains (filepath, file_hash, now)
-                for each successfully hashed photo.
+        Tk may only be used from the main thread, so the update is queued and
+        applied by _show_posted_scanning_text() on the main thread. At most one
+        update is queued at a time, which shows the latest text posted, so a
+        fast scan doesn't flood the main thread with label updates.
+        """
+        self.posted_scanning_text = text
+        if not self.scanning_text_call_queued:
+            self.scanning_text_call_queued = True
+            self.call_in_main_thread(self._show_posted_scanning_text)
 
-        This method processes each file serially and updates the GUI after every 50
-        files (and at the end) for responsive progress feedback.
+    def _show_posted_scanning_text(self):
         """
-        new_photos_data = []
-        for i, filepath in enumerate(new_filepaths, 1):
-            filepath, file_hash = self.hasher.dhash_file(filepath)
-            if file_hash:
-                new_photos_data.append((filepath, file_hash, now))
+        Show the latest status text posted by post_scanning_text().
 
-        return new_photos_data
+        Runs on the main thread. The queued flag is cleared before the text is
+        read, so a text posted in between is either shown now or queues its own
+        update.
+        """
+        self.scanning_text_call_queued = False
+        self.update_scanning_text(self.posted_scanning_text)
 
-    def compute_file_hashes_multiprocessing(self, new_filepaths, now):
+    def call_in_main_thread(self, fn, *args):
+        """
+        Schedule a function to be called on the Tk main thread.
+
+        Args:
+            fn (callable): The function to call.
+            *args: Positional arguments to pass to fn.
+
+        Safe to call from any thread. The call is queued and run by
+        _process_main_thread_calls() on the main thread.
+        """
+        self.main_thread_calls.put((fn, args))
+
+    def _process_main_thread_calls(self):
+        """
+        Run the calls queued by call_in_main_thread(), then poll again.
+
+        Runs on the main thread every 50 milliseconds for the lifetime of the
+        GUI. An error in one call is printed and does not stop the polling.
+        """
+        try:
+            while True:
+                try:
+                    fn, args = self.main_thread_calls.get_nowait()
+                except Empty:
+                    break
+
+                try:
+                    fn(*args)
+                except Exception as e:
+                    print(f"Error in main thread call {fn.__name__}: {e}")
+        finally:
+            self.tk_root.after(50, self._process_main_thread_calls)
+
+    def compute_file_hashes_multiprocessing(self, executor, num_workers, new_filepaths):
         """
         Compute image hashes for a list of new photos using multiprocessing.
 
         Args:
+            executor (ProcessPoolExecutor): Pool of worker processes to hash on.
+                The pool is owned by the caller, so that it can be reused
+                instead of being started for every call.
+            num_workers (int): Number of worker processes in the pool.
             new_filepaths (list of str): File paths to new photos that need hashing.
-            now (datetime): The datetime to associate as the 'last seen' timestamp.
 
-        Returns:
-            list of tuples: Each tuple contains (filepath, file_hash, now) for each
-                successfully hashed photo.
-
-        Uses a ProcessPoolExecutor to parallelize hashing across multiple CPU cores.
-        Updates the GUI with progress roughly every 50 files and at the end.
-        Handles exceptions gracefully and prints errors encountered during hashing.
+        Yields:
+            tuple: (filepath, file_hash) for each successfully hashed photo, as
+                soon as the chunk containing it has been hashed.
+
+        The files are split into chunks, each hashed with a single vectorized
+        Hasher.dhash_batch call by the worker's own Hasher, which the pool must
+        have set up with init_worker. Chunks are sized to give every worker
+        about eight of them, between 1 and 64 files, so large scans need few
+        round-trips to the workers while small ones still share the work evenly.
+        Twice as many chunks as there are workers are kept in flight, and a new
+        chunk is submitted as soon as one completes, so a slow file only holds
+        up its own chunk rather than leaving the other workers idle. Posts
+        progress to the GUI as each chunk completes. Handles exceptions
+        gracefully and prints errors encountered during hashing.
         """
-        new_photos_data = []
+        chunk_size = max(1, min(64, len(new_filepaths) // (num_workers * 8)))
+        chunks = (
+            new_filepaths[i : i + chunk_size]
+            for i in range(0, len(new_filepaths), chunk_size)
+        )
 
-        # Determine optimal number of worker processes
-        # (capped by total files and at most 8)
-        max_workers = min(cpu_count() or 4, len(new_filepaths), 8)
+        # Submit the first round of hashing tasks
+        future_to_filepaths = {}
+        for chunk in islice(chunks, 2 * num_workers):
+            future = executor.submit(dhash_batch_in_worker, chunk)
+            future_to_filepaths[future] = chunk
 
+        # Process results as they complete
         completed_count = 0
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all hashing tasks
-            future_to_filepath = {
-                executor.submit(self.hasher.dhash_file, filepath): filepath
-                for filepath in new_filepaths
-            }
-
-            # Process results as they complete
-            for future in as_completed(future_to_filepath):
-                completed_count += 1
-
-                # Update GUI every 50 files to reduce overhead
-                should_update = completed_count % 50 == 0 or completed_count == len(
-                    new_filepaths
+        while future_to_filepaths:
+            done, _ = wait(future_to_filepaths, return_when=FIRST_COMPLETED)
+            for future in done:
+                filepaths = future_to_filepaths.pop(future)
+
+                # Keep the workers busy with the next chunk
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    future_to_filepaths[
+                        executor.submit(dhash_batch_in_worker, chunk)
+                    ] = chunk
+
+                completed_count += len(filepaths)
+                self.post_scanning_text(
+                    f"Analyzing new photos {completed_count}/{len(new_filepaths)}..."
                 )
-                if should_update:
-                    self.update_scanning_text(
-                        f"Analyzing new photos "
-                        f"{completed_count}/{len(new_filepaths)}..."
-                    )
 
                 try:
-                    filepath, file_hash = future.result()
-                    if file_hash:
-                        new_photos_data.append((filepath, file_hash, now))
+                    results = future.result()
                 except Exception as e:
                     # Handle any errors from the worker process
-                    print(f"Error processing {future_to_filepath[future]}: {e}")
+                    print(f"Error processing {len(filepaths)} photos: {e}")
                     continue
 
-        return new_photos_data
+                for filepath, file_hash in results:
+                    if file_hash:
+                        yield filepath, file_hash
 
-    def display_thumbnails_in_frame(self, hash_frame, filepaths):
-        """Display photo thumbnails in a grid layout within the given frame.
+    def get_thumbnail_cache_path(self, filepath, content_hash=None, mtime_ns=None):
+        """Get the path that a photo's thumbnail is cached at.
 
         Args:
-            hash_frame: Tkinter Frame widget to display thumbnails in.
-            filepaths: List of file paths to images to display as thumbnails.
+            filepath: Path to the image file.
+            content_hash: Hash of the file's whole contents, or None if it
+                hasn't been hashed.
+            mtime_ns: Modification time of the file, in nanoseconds. The file
+                is stat'd for it if it isn't given.
 
         Returns:
-            List of PhotoImage objects representing the thumbnails. These
-            must be kept in scope to prevent garbage collection.
+            Path to the thumbnail in the thumbnail cache directory. The file
+            may not exist yet.
+
+        Thumbnails are keyed by the content hash, so byte-identical copies
+        share one cached thumbnail. Only files that have been confirmed as
+        copies, or as not being copies, of another file have a content hash.
+        The rest are keyed by filepath and modification time instead. The
+        prehash can't be used, as files that only differ in the middle share
+        it.
+        """
+        if content_hash is not None:
+            key = content_hash.hex()
+        else:
+            # Key the thumbnail on the modification time too, so that edited
+            # photos get a new one
+            if mtime_ns is None:
+                mtime_ns = Path(filepath).stat().st_mtime_ns
+            key = sha1(f"{filepath}:{mtime_ns}".encode()).hexdigest()
+        return self.thumbnail_cache_dir / key[:2] / f"{key}.jpg"
 
-        Loads each image, creates a 200x200 thumbnail, and arranges them
-        in a grid with 5 columns. Handles errors gracefully by skipping
-        images that cannot be loaded.
+    def sweep_thumbnail_cache(self, database, removed_photos, rekeyed_photos=()):
+        """Delete the cached thumbnails that are no longer needed.
+
+        Args:
+            database: Database instance owned by the calling thread.
+            removed_photos: (filepath, hash, mtime, content_hash) tuples of the
+                photos deleted from the database, as returned by
+                Database.pop_removed_photos.
+            rekeyed_photos: (filepath, mtime, content_hash) tuples of photos
+                that have just been given a content hash.
+
+        Runs on the scan thread at the end of a scan, and on the query thread
+        after photos are deleted. Only the thumbnails of the photos that
+        changed are looked at, rather than every file in the cache. Those of
+        the deleted photos are removed, so the cache doesn't keep growing as
+        photos are deleted, edited or moved out of the scanned folders. Only
+        photos with duplicates are ever shown, so the thumbnails of photos
+        that were only duplicates of the deleted ones are removed too, and the
+        cache grows with the number of duplicates rather than the size of the
+        library. A thumbnail shared by copies is kept while any copy still
+        has a duplicate.
+
+        The thumbnails of photos given a content hash were keyed by filepath
+        and modification time, and are moved to their new key instead, as the
+        photos themselves haven't changed.
         """
-        thumbnails = []
-        row, col = 0, 0
+        # Move the thumbnails of newly content-hashed photos
+        for filepath, mtime_ns, content_hash in rekeyed_photos:
+            old_path = self.get_thumbnail_cache_path(filepath, None, mtime_ns)
+            new_path = self.get_thumbnail_cache_path(filepath, content_hash)
+            if not old_path.exists():
+                continue
 
-        # Run through all of the photograph files in alphabetical order
-        for filepath in sorted(filepaths, key=lambda n: n.lower()):
             try:
-                # Create the Image object
-                img = Image.open(filepath)
-
-                # Convert it into a thumbnail
-                img.thumbnail((200, 200))
+                if new_path.exists():
+                    old_path.unlink()
+                else:
+                    new_path.parent.mkdir(exist_ok=True)
+                    old_path.replace(new_path)
+            except OSError as e:
+                print(f"Error moving cached thumbnail {old_path}: {e}")
+
+        # The deleted photos, and the photos left without a duplicate
+        photos = [
+            (filepath, mtime_ns, content_hash)
+            for filepath, _, mtime_ns, content_hash in removed_photos
+        ]
+        photos += database.get_unduplicated_photos(
+            {photo[1] for photo in removed_photos}
+        )
 
-                # Create a Tkinter-compatible photo image object
-                thumbnail = ImageTk.PhotoImage(img)
+        # Keep the thumbnails shared with copies that still have a duplicate
+        kept_content_hashes = database.get_duplicated_content_hashes(
+            {content_hash for _, _, content_hash in photos if content_hash}
+        )
 
-                # Add it to our list of thumbnails
-                thumbnails.append(thumbnail)
-            except Exception as e:
-                print(f"Error loading image {filepath}: {e}")
+        for filepath, mtime_ns, content_hash in photos:
+            # Photos indexed before their modification time was stored can't
+            # be matched to their thumbnails
+            if content_hash in kept_content_hashes or (
+                content_hash is None and mtime_ns is None
+            ):
                 continue
 
-            # Create a frame for the thumbnail. We'll change its border
-            # to indicate selected/deselecated
+            cache_path = self.get_thumbnail_cache_path(filepath, content_hash, mtime_ns)
             try:
-                thumbnail_frame = ttk.Frame(
-                    hash_frame,
-                    borderwidth=3,
-                    relief="solid" if filepath in self.selected_filepaths else "flat",
-                )
-                thumbnail_frame.grid(row=row, column=col, padx=5, pady=5)
-
-                # Display the thumbnail within the frame
-                thumbnail_label = ttk.Label(thumbnail_frame, image=thumbnail)
-                thumbnail_label.pack()
-
-                # Add in filepath and frame attributes to the Label, for later reference
-                thumbnail_label.filepath = filepath
-                thumbnail_label.thumbnail_frame = thumbnail_frame
-
-                # Bind a click event to the Label, to toggle selection
-                thumbnail_label.bind(
-                    "<Button-1>",
-                    lambda e, fp=filepath, t_f=thumbnail_frame: (
-                        self.toggle_filepath_selection(fp, t_f)
-                    ),
-                )
+                cache_path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error removing cached thumbnail {cache_path}: {e}")
+
+    def decode_thumbnail(self, filepath, content_hash=None):
+        """Load a photo and scale it down to thumbnail size.
 
-                # Add a tooltip to the thumbnail
-                self.tooltips.append(ToolTip(thumbnail_label, msg=filepath))
+        Args:
+            filepath: Path to the image file to load.
+            content_hash: Hash of the file's whole contents from the database,
+                or None if it doesn't have one.
 
-                # Add the filepath underneath the thumbnail
-                filename = filepath.split("/")[-1]
-                filepath_label = ttk.Label(thumbnail_frame, text=filename)
-                filepath_label.pack()
+        Returns:
+            PIL Image scaled to fit within the thumbnail size, or None if the
+            image couldn't be loaded.
+
+        Runs on the thumbnail thread pool. Pillow releases the GIL while
+        decoding and resizing, so several photos are processed at once.
+        Thumbnails are saved to the thumbnail cache directory as small JPEGs,
+        and loaded from there when available, so each photo is only decoded
+        at full size the first time it's shown.
+        """
+        try:
+            cache_path = self.get_thumbnail_cache_path(filepath, content_hash)
 
-                self.tk_root.update()  # Force GUI update
-            except TclError:
+            # Use the cached thumbnail if there is one
+            try:
+                img = Image.open(cache_path)
+                img.load()
+                return img
+            except OSError:
                 pass
 
-            # Increment the row and column
-            col += 1
-            if col >= self.thumbnails_cols:
-                col = 0
-                row += 1
+            # Create the Image object. This only reads the header.
+            img = Image.open(filepath)
+
+            # Photos that already fit are used as they are, only rotated
+            # upright. Decode them here, rather than on the main thread, and
+            # don't bother caching them.
+            if max(img.size) <= self.thumbnail_size:
+                img.load()
+                return ImageOps.exif_transpose(img)
+
+            # Convert it into a thumbnail, with libvips if it's installed
+            if pyvips is not None:
+                img.close()
+                img = self.vips_thumbnail(filepath)
+
+            # Otherwise, large photos are first shrunk with a cheap
+            # pixel-averaging reduce (or a reduced-scale JPEG decode) to within
+            # twice the thumbnail size, then resampled the rest of the way.
+            # libvips rotates the photo upright by its EXIF orientation, so the
+            # smaller thumbnail is rotated to match.
+            else:
+                img.thumbnail(
+                    (self.thumbnail_size, self.thumbnail_size),
+                    Image.Resampling.BILINEAR,
+                    reducing_gap=2.0,
+                )
+                ImageOps.exif_transpose(img, in_place=True)
+
+            # Save the thumbnail for next time
+            try:
+                cache_path.parent.mkdir(exist_ok=True)
+                img.convert("RGB").save(cache_path, "JPEG", quality=85)
+            except OSError as e:
+                print(f"Error caching thumbnail for {filepath}: {e}")
+
+            return img
+        except Exception as e:
+            print(f"Error loading image {filepath}: {e}")
+            return None
 
-        # Return the thumbnail objects to prevent garbage collection
-        return thumbnails
+    def vips_thumbnail(self, filepath):
+        """Scale a photo down to thumbnail size with libvips.
 
-    def toggle_filepath_selection(self, filepath, thumbnail_frame):
+        Args:
+            filepath: Path to the image file to load.
+
+        Returns:
+            PIL Image, in RGB or RGBA mode, scaled to fit within the thumbnail
+            size.
+
+        Only used when pyvips is installed. libvips decodes JPEGs at a reduced
+        scale and shrinks other images while streaming them, so the full-size
+        photo is never held in memory, and is usually several times faster
+        than Pillow. Like the Pillow paths, libvips rotates the photo upright
+        by its EXIF orientation. The result is converted to 8-bit sRGB and
+        copied into a PIL Image, so it's cached and displayed like any other
+        thumbnail.
+        """
+        thumbnail = pyvips.Image.thumbnail(filepath, self.thumbnail_size)
+        thumbnail = thumbnail.colourspace("srgb")
+        return Image.frombytes(
+            "RGBA" if thumbnail.hasalpha() else "RGB",
+            (thumbnail.width, thumbnail.height),
+            thumbnail.write_to_memory(),
+        )
+
+    def show_thumbnail(self, key, img, generation):
+        """Display a decoded thumbnail and add it to the thumbnail cache.
+
+        Args:
+            key: Key of the thumbnail, from thumbnail_keys.
+            img: PIL Image returned by decode_thumbnail, or None.
+            generation: thumbnail_generation when the decode was submitted.
+
+        Runs on the main thread, since ImageTk isn't thread-safe. A single
+        PhotoImage is shown for every photo on the page with the key. The
+        thumbnail is cached even if no such photo is on the page anymore.
+        Thumbnails decoded before the cache was last cleared are dropped, as
+        they may show an old version of the photo.
+        """
+        if generation != self.thumbnail_generation:
+            return
+
+        self.decoding_thumbnails.discard(key)
+
+        try:
+            thumbnail = self.get_photo_image(img) if img is not None else None
+            if thumbnail is not None:
+                for filepath in self.thumbnail_key_filepaths.get(key, ()):
+                    self.thumbnails_container.set_image(filepath, thumbnail)
+
+            self.cache_thumbnail(key, thumbnail)
+        except TclError:
+            pass
+
+    def cache_thumbnail(self, key, thumbnail):
+        """Add a thumbnail to the cache, evicting the least recently shown.
+
+        Args:
+            key: Key of the thumbnail, from thumbnail_keys.
+            thumbnail: ImageTk.PhotoImage of the photo, or None if it couldn't
+                be loaded.
+
+        The cache holds at most thumbnail_cache_size thumbnails, unless more
+        than that are in view at once, so visible thumbnails are never
+        evicted. Evicted thumbnails still on the page are cleared so that Tk
+        can free the image, and are reloaded if scrolled back into view.
+        """
+        self.thumbnail_cache[key] = thumbnail
+        self.thumbnail_cache.move_to_end(key)
+
+        max_size = max(self.thumbnail_cache_size, self.num_visible_thumbnails)
+        while len(self.thumbnail_cache) > max_size:
+            evicted_key, evicted = self.thumbnail_cache.popitem(last=False)
+            for filepath in self.thumbnail_key_filepaths.get(evicted_key, ()):
+                self.thumbnails_container.set_image(filepath, "")
+
+            # Keep the evicted PhotoImage to paste a later thumbnail into
+            if (
+                evicted is not None
+                and evicted.spare_key is not None
+                and self.num_spare_thumbnails < self.max_spare_thumbnails
+            ):
+                self.spare_thumbnails.setdefault(evicted.spare_key, []).append(evicted)
+                self.num_spare_thumbnails += 1
+
+    def get_photo_image(self, img):
+        """Get a Tkinter-compatible photo image of a thumbnail.
+
+        Args:
+            img: PIL Image of the thumbnail.
+
+        Returns:
+            ImageTk.PhotoImage showing the image.
+
+        Pastes the image into a spare PhotoImage of the same mode and size if
+        there is one, and creates a new PhotoImage otherwise. Only images in
+        modes that PhotoImage holds as they are can be pasted into a spare,
+        since others are converted when the PhotoImage is created.
+        """
+        spare_key = (img.mode, img.size) if img.mode in ("L", "RGB", "RGBA") else None
+        spares = self.spare_thumbnails.get(spare_key)
+        if spares:
+            thumbnail = spares.pop()
+            self.num_spare_thumbnails -= 1
+            thumbnail.paste(img)
+        else:
+            thumbnail = ImageTk.PhotoImage(img)
+            thumbnail.spare_key = spare_key
+        return thumbnail
+
+    def schedule_render_visible_thumbnails(self, _event=None):
+        """Schedule render_visible_thumbnails to run once the GUI is idle.
+
+        Args:
+            _event: Tkinter event object (unused).
+
+        Scrolling and resizing generate many view changes in quick succession.
+        They are collapsed into a single render once pending events and
+        geometry updates have been handled.
+        """
+        if self._render_running is None:
+            self._render_running = self.tk_root.after_idle(
+                self.render_visible_thumbnails
+            )
+
+    def render_visible_thumbnails(self):
+        """Load the images of thumbnails that are within the visible area.
+
+        Only thumbnails intersecting the scroll viewport, plus a margin of one
+        thumbnail above and below, are loaded. Cached thumbnails are shown
+        right away; the rest are decoded on the thumbnail thread pool and
+        shown by show_thumbnail as they finish.
+        """
+        self._render_running = None
+
+        try:
+            visible_filepaths = self.thumbnails_container.get_visible_filepaths(
+                margin=self.thumbnail_size
+            )
+            self.num_visible_thumbnails = len(visible_filepaths)
+            generation = self.thumbnail_generation
+            for filepath in visible_filepaths:
+                key = self.thumbnail_keys[filepath]
+
+                # Mark a loaded thumbnail as recently shown
+                if key in self.thumbnail_cache:
+                    self.thumbnail_cache.move_to_end(key)
+                    thumbnail = self.thumbnail_cache[key]
+                    if thumbnail is not None:
+                        self.thumbnails_container.set_image(filepath, thumbnail)
+
+                # Otherwise decode it in the background, unless already underway
+                elif key not in self.decoding_thumbnails:
+                    self.decoding_thumbnails.add(key)
+                    future = self.thumbnail_executor.submit(
+                        self.decode_thumbnail,
+                        filepath,
+                        self.thumbnail_content_hashes.get(filepath),
+                    )
+                    future.add_done_callback(
+                        lambda f, key=key: self.call_in_main_thread(
+                            self.show_thumbnail, key, f.result(), generation
+                        )
+                    )
+        except TclError:
+            pass
+
+    def toggle_filepath_selection(self, filepath):
         """Toggle the selection state of a photo thumbnail.
 
         Args:
             filepath: Path to the photo file to toggle selection for.
-            thumbnail_frame: Tkinter Frame widget containing the thumbnail.
-                The frame's relief is updated to visually indicate selection
-                state (solid for selected, flat for unselected).
 
-        If the filepath is already selected, it is removed from the selection
-        and the frame border is set to flat. If not selected, it is added to
-        the selection and the frame border is set to solid. The delete button
-        is enabled if any photos are selected, disabled otherwise.
+        Called by the thumbnails canvas when a thumbnail is clicked. If the
+        filepath is already selected, it is removed from the selection and
+        its thumbnail's outline is hidden. If not selected, it is added to the
+        selection and its thumbnail is outlined. The delete button is enabled
+        if any photos are selected, disabled otherwise.
         """
         if filepath in self.selected_filepaths:
             self.selected_filepaths.remove(filepath)
-            thumbnail_frame.configure(relief="flat")
+            self.thumbnails_container.set_selected(filepath, False)
         else:
             self.selected_filepaths.add(filepath)
-            thumbnail_frame.configure(relief="solid")
+            self.thumbnails_container.set_selected(filepath, True)
 
         # Enable or disable the Delete button
         self.delete_button.state(
@@ -654,56 +1347,173 @@ class Interface:
     def display_thumbnails(self):
         """Populate the thumbnails container with duplicate photos from the database.
 
-        Retrieves all duplicate photos grouped by hash from the database,
-        clears any existing thumbnails, and displays each group of duplicates
-        in separate frames. Maintains references to thumbnail objects to
-        prevent garbage collection.
+        Asks the query thread for the current page of duplicate photos and
+        returns straight away, so the GUI isn't blocked on SQLite. The page is
+        laid out by show_page once the rows arrive.
         """
-        # Destroy any lingering Tooltip object
-        self.destroy_tooltips()
+        # Grab the duplicate photos on the query thread
+        self.query_requests.put(
+            (
+                self._query_page,
+                (
+                    list(self.finder.directories_to_scan),
+                    self.database.page_number,
+                    self.database.page_start_hashes,
+                ),
+            )
+        )
 
-        # Scroll to the top of the thumbnails frame
-        self.thumbnails_container.canvas.yview_moveto(0.0)
+        # Update the number of selected photos
+        self.update_scanning_text(
+            f"{len(self.selected_filepaths)} "
+            f"photo{'' if len(self.selected_filepaths) == 1 else 's'} selected"
+        )
 
-        # Grab the duplicate photos, grouped by hash
-        db_rows = self.database.query_database(self.finder.directories_to_scan)
+    def refresh_pages(self, directories_to_scan=None, page_number=None):
+        """Recount the pages of duplicates and show the current page again.
 
-        # Remove any previous thumbnail groups
-        for child in self.thumbnails_container.frame.winfo_children():
-            child.destroy()
+        Args:
+            directories_to_scan: List of directory paths to show duplicates
+                from. Defaults to the finder's directories.
+            page_number: Page to show, if it still exists. Defaults to the
+                current page.
+
+        The pages are counted on the query thread, since that takes a pass
+        over the whole photos table. The pagination UI and thumbnails are
+        updated on the main thread once it's done.
+        """
+        if directories_to_scan is None:
+            directories_to_scan = self.finder.directories_to_scan
+        if page_number is None:
+            page_number = self.database.page_number
 
-        # Will need to save the thumbnail objects, to avoid garbage collection
-        self.hash_and_thumbnails = {}
+        self.query_requests.put(
+            (self._count_pages, (list(directories_to_scan), page_number))
+        )
 
-        row_index = 0
-        num_rows = len(db_rows)
-        for i, (hash, concat_filepaths) in enumerate(db_rows, 1):
-            # Update the scanning text at the top
-            self.update_scanning_text(f"Displaying group {i}/{num_rows}...")
+    def _query_worker(self):
+        """Run the database calls requested by the main thread.
 
-            # Get the list of filepaths
-            filepaths = concat_filepaths.split(",")
+        Runs on a daemon thread for the lifetime of the GUI, with its own
+        SQLite connection. Each request is a function and its arguments, and
+        is called with the thread's Database instance first. Requests are run
+        in the order they were made, except that a page query is skipped if
+        more requests have queued up behind it, since every request ends by
+        showing a page, which would replace it immediately. An error in one
+        request is printed and does not stop the thread.
+        """
+        database = Database(self.database.db_path)
+        while True:
+            requests = [self.query_requests.get()]
 
-            # Create a new Frame for the hash's thumbnails
-            hash_frame = ttk.Frame(self.thumbnails_container.frame)
-            hash_frame.grid(row=row_index, column=0, sticky=(W))
-            row_index += 1
+            # Grab the requests queued up since
+            try:
+                while True:
+                    requests.append(self.query_requests.get_nowait())
+            except Empty:
+                pass
 
-            # Put the thumbnails into the frame
-            thumbnails = self.display_thumbnails_in_frame(hash_frame, filepaths)
+            for i, (fn, args) in enumerate(requests):
+                if fn == self._query_page and i < len(requests) - 1:
+                    continue
 
-            # Put in a visual separator spanning the full width of the frame
-            separator = ttk.Separator(
-                self.thumbnails_container.frame, orient="horizontal"
-            )
-            separator.grid(row=row_index, column=0, sticky=(E, W), padx=10, pady=5)
-            row_index += 1
+                try:
+                    fn(database, *args)
+                except Exception as e:
+                    print(f"Error in query thread call {fn.__name__}: {e}")
 
-            # Save the thumbnail objects, to avoid garbage collection
-            self.hash_and_thumbnails[hash] = thumbnails
+    def _query_page(
+        self, database, directories_to_scan, page_number, page_start_hashes
+    ):
+        """Query a page of duplicate photos and show it.
 
-        # Update the number of selected photos
-        self.update_scanning_text(
-            f"{len(self.selected_filepaths)} "
-            f"photo{'' if len(self.selected_filepaths) == 1 else 's'} selected"
+        Args:
+            database: Database instance owned by the query thread.
+            directories_to_scan: List of directory paths to show duplicates
+                from.
+            page_number: Page to query.
+            page_start_hashes: First hash on each page, from
+                Database.update_num_pages.
+
+        Runs on the query thread. The rows are passed to show_page on the
+        main thread.
+        """
+        database.page_number = page_number
+        database.page_start_hashes = page_start_hashes
+        db_rows = database.query_database(directories_to_scan)
+        self.call_in_main_thread(self.show_page, db_rows)
+
+    def _count_pages(self, database, directories_to_scan, page_number):
+        """Count the pages of duplicate photos and show one of them.
+
+        Args:
+            database: Database instance owned by the query thread.
+            directories_to_scan: List of directory paths to show duplicates
+                from.
+            page_number: Page to show, if it still exists. Otherwise the last
+                page is shown.
+
+        Runs on the query thread. The pagination info is passed to
+        show_num_pages on the main thread, and the page to show_page.
+        """
+        database.update_num_pages(directories_to_scan)
+        page_number = min(page_number, database.num_pages)
+        self.call_in_main_thread(
+            self.show_num_pages,
+            database.num_pages,
+            page_number,
+            database.page_start_hashes,
+        )
+        self._query_page(
+            database, directories_to_scan, page_number, database.page_start_hashes
         )
+
+    def show_num_pages(self, num_pages, page_number, page_start_hashes):
+        """Update the pagination info and UI with newly counted pages.
+
+        Args:
+            num_pages: Number of pages of duplicates.
+            page_number: Page being shown.
+            page_start_hashes: First hash on each page.
+
+        Runs on the main thread. The main thread's Database instance holds the
+        pagination state that the navigation buttons work from.
+        """
+        self.database.num_pages = num_pages
+        self.database.page_number = page_number
+        self.database.page_start_hashes = page_start_hashes
+
+        # Update the navigation
+        self.update_prev_next_button_states()
+        self.update_num_pages_label()
+
+    def show_page(self, db_rows):
+        """Lay out a page of duplicate photos in the thumbnails container.
+
+        Args:
+            db_rows: Rows returned by Database.query_database for the page.
+
+        Groups the rows by hash and draws each group of duplicates in its own
+        rows of the thumbnails canvas, replacing the previous page. Only the
+        thumbnails scrolled into view have their images loaded.
+        """
+        groups = [
+            [row[1] for row in rows] for _, rows in groupby(db_rows, key=itemgetter(0))
+        ]
+
+        # Content hashes, to find the photos' cached thumbnails by.
+        # Byte-identical copies share a thumbnail.
+        self.thumbnail_content_hashes = {}
+        self.thumbnail_keys = {}
+        self.thumbnail_key_filepaths = {}
+        for _, filepath, content_hash in db_rows:
+            key = content_hash or filepath
+            self.thumbnail_content_hashes[filepath] = content_hash
+            self.thumbnail_keys[filepath] = key
+            self.thumbnail_key_filepaths.setdefault(key, []).append(filepath)
+
+        # Draw the groups, without images, scrolled to the top
+        self.thumbnails_container.show_groups(groups, self.selected_filepaths)
+
+        # Load the thumbnails that are in view
+        self.schedule_render_visible_thumbnails()
@@ -16,9 +16,10 @@ class DuplicatePhotoFinder:
     def __init__(self):
         """Initialize the DuplicatePhotoFinder application.
 
-        Sets up the configuration directory structure, database path, and
-        directory to scan. Initializes component references (database, finder,
-        interface) to None, which will be initialized later.
+        Sets up the configuration directory structure, database path,
+        thumbnail cache directory, and directory to scan. Initializes component
+        references (database, finder, interface) to None, which will be
+        initialized later.
         """
         # Create the folder to store our info, if necessary
         home_folder = Path.home()
@@ -30,6 +31,13 @@ class DuplicatePhotoFinder:
         db_name = "photos.db"
         self.db_path = f"{full_path}/{db_name}"
 
+        # Create the folder to cache thumbnails in, if necessary
+        cache_folder = ".cache"
+        self.thumbnail_cache_path = (
+            home_folder / cache_folder / root_folder / "thumbnails"
+        )
+        self.thumbnail_cache_path.mkdir(parents=True, exist_ok=True)
+
         self.database = None
         self.finder = None
         self.interface = None
@@ -66,12 +74,15 @@ class DuplicatePhotoFinder:
     def init_interface(self):
         """Initialize the graphical user interface.
 
-        Creates an Interface instance with the database and finder components.
+        Creates an Interface instance with the database and finder components,
+        and the directory to cache thumbnails in.
         The interface provides the GUI for displaying duplicate photos and
         managing the scanning process.
         """
         # Instantiate the GUI
-        self.interface = Interface(self.database, self.finder, self.hasher)
+        self.interface = Interface(
+            self.database, self.finder, self.hasher, self.thumbnail_cache_path
+        )
 
     def run(self):
         """Run the duplicate photo finder application.
@@ -1,10 +1,16 @@
 """Custom Tkinter widgets for the duplicate photo finder GUI.
 
 This module provides custom widget classes including OutlinedFrame for
-bordered frames and VerticalScrollFrame for scrollable content containers.
+bordered frames, SharedToolTip for a single tooltip serving many canvas items,
+and ThumbnailCanvas for scrollable groups of photo thumbnails.
 """
 
-from tkinter import VERTICAL, Canvas, E, N, S, W, ttk
+from math import ceil
+from os.path import basename
+from tkinter import VERTICAL, Canvas, E, N, S, W, font, ttk
+
+from tktooltip import ToolTip
+from tktooltip.tooltip import Binding
 
 
 class OutlinedFrame(ttk.Frame):
@@ -20,31 +26,118 @@ class OutlinedFrame(ttk.Frame):
         Creates a ttk.Frame with visible borders by default, making it
         useful for creating outlined sections in the GUI.
         """
-        super().__init__(
-            *args,
-            **kwargs,
-            relief=kwargs.get("relief", "ridge"),
-            borderwidth=kwargs.get("borderwidth", 2)
+        kwargs.setdefault("relief", "ridge")
+        kwargs.setdefault("borderwidth", 2)
+        super().__init__(*args, **kwargs)
+
+
+class SharedToolTip(ToolTip):
+    def __init__(self, canvas, **kwargs):
+        """Initialize a single tooltip that can be shown for many canvas items.
+
+        Args:
+            canvas: Canvas the tooltip belongs to. Unlike a plain ToolTip, it
+                isn't shown when hovering the whole widget, only the items
+                passed to attach.
+            **kwargs: Variable keyword arguments passed to ToolTip.
+
+        A plain ToolTip is bound to a whole widget, and shows the same message
+        anywhere within it. This one is bound to canvas items by tag, and
+        shows the message of whichever item is hovered, so one tooltip serves
+        every thumbnail on a canvas.
+        """
+        super().__init__(canvas, msg="", **kwargs)
+
+    def _init_bindings(self):
+        """Bind the tooltip to the whole canvas only to hide it on clicks.
+
+        Returns:
+            List of the tooltip's bindings to the canvas. Showing the tooltip
+            is bound to canvas items by attach instead.
+
+        Hiding is bound to the canvas rather than to the items, as an item
+        only runs its most specific binding for an event, so a <ButtonPress>
+        binding would be shadowed by the <Button-1> binding that handles
+        clicks on the thumbnails.
+        """
+        return [Binding(self.widget, "<ButtonPress>", self.on_leave)]
+
+    def attach(self, tag, msg):
+        """Show the tooltip while hovering the canvas items with a tag.
+
+        Args:
+            tag: Tag of the canvas items to show the tooltip for.
+            msg: Callable taking the ID of the hovered item and returning the
+                string to display.
+        """
+        self.widget.tag_bind(
+            tag, "<Enter>", lambda event: self._on_item_enter(event, msg)
         )
+        self.widget.tag_bind(tag, "<Leave>", self.on_leave)
+        if self.follow:
+            self.widget.tag_bind(tag, "<Motion>", self._update_tooltip_coords)
 
+    def _on_item_enter(self, event, msg):
+        """Show the message of the canvas item the mouse has entered.
+
+        Args:
+            event: Tkinter event object for the item that was entered.
+            msg: Callable taking the ID of the item and returning its message.
+        """
+        self.msg = msg(self.widget.find_withtag("current")[0])
+        self.on_enter(event)
 
-class VerticalScrollFrame(ttk.Frame):
-    def __init__(self, parent, *args, **kwargs):
-        """Initialize a vertically scrollable frame widget.
+
+class ThumbnailCanvas(ttk.Frame):
+    def __init__(self, parent, size, columns, command, *args, **kwargs):
+        """Initialize a scrollable canvas that displays groups of thumbnails.
 
         Args:
             parent: Parent widget for this frame.
+            size: Width and height of the thumbnail area, in pixels.
+            columns: Number of thumbnails in each row.
+            command: Callable taking a filepath, called when the thumbnail of
+                that photo is clicked.
             *args: Variable positional arguments passed to ttk.Frame.
             **kwargs: Variable keyword arguments passed to ttk.Frame.
                 'width' and 'height' are used to size the canvas.
 
-        Creates a scrollable container with a canvas, vertical scrollbar,
-        and an inner frame for content. The inner frame automatically
-        adjusts its scrollable region and width. Mouse wheel scrolling
-        is enabled when the mouse enters the canvas area.
+        Every thumbnail is drawn as a few items on a single Canvas, rather
+        than as its own set of widgets, so Tk has one widget to lay out and
+        redraw no matter how many photos are shown. Each thumbnail is a filled
+        rectangle, which takes clicks, shows the tooltip and outlines selected
+        photos, with the image and filename drawn on top of it. Mouse wheel
+        scrolling works while the mouse is over the canvas. A
+        <<ViewChanged>> virtual event is generated whenever the visible area
+        changes.
         """
         # Create the outer Frame instance, bound to the parent
         super().__init__(parent, *args, **kwargs)
+        self.size = size
+        self.columns = columns
+        self.command = command
+
+        # Mouse wheel steps waiting to be scrolled, and the pending scroll call
+        self.pending_scroll = 0
+        self._scroll_running = None
+
+        # Canvas items of each thumbnail by filepath, as (rectangle, image)
+        # item IDs, and the filepath of each rectangle
+        self.thumbnail_items = {}
+        self.rectangle_filepaths = {}
+
+        # Filenames shown under the thumbnails by filepath, shortened to fit.
+        # Measuring text is relatively slow, so these are carried over to the
+        # next page for the photos that are still on it.
+        self.filenames = {}
+
+        # Thumbnail spacing, matching the ttk widgets they used to be
+        self.border = 3
+        self.padding = 5
+        self.font = font.nametofont("TkDefaultFont", root=self)
+        self.text_height = self.font.metrics("linespace")
+        self.cell_width = size + 2 * (self.border + self.padding)
+        self.cell_height = self.cell_width + self.text_height
 
         # Canvas (a scrollable widget)
         self.canvas = Canvas(
@@ -57,65 +150,204 @@ class VerticalScrollFrame(ttk.Frame):
         self.canvas.grid(column=0, row=0, sticky=(N, S, E, W))
 
         # Scrollbar bound to the canvas
-        scrollbar = ttk.Scrollbar(
+        self.scrollbar = ttk.Scrollbar(
             self,
             orient=VERTICAL,
             command=self.canvas.yview,
         )
-        scrollbar.grid(column=1, row=0, sticky=(N, S))
-        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.scrollbar.grid(column=1, row=0, sticky=(N, S))
+        self.canvas.configure(yscrollcommand=self._on_yscroll)
 
-        # Inner frame that will actually hold the content, embedded in the canvas
-        self.frame = ttk.Frame(self.canvas)
-        self.frame_window = self.canvas.create_window(
-            (0, 0), window=self.frame, anchor="nw"
-        )
+        # Keep the separators the full width of the canvas
+        self.canvas.bind("<Configure>", self._on_configure)
 
-        # Update the scrollable region whenever the inner frame changes size
-        self.frame.bind(
-            "<Configure>",
-            lambda event: self.canvas.configure(scrollregion=self.canvas.bbox("all")),
-        )
+        # Call the command with the photo whose thumbnail was clicked
+        self.canvas.tag_bind("thumbnail", "<Button-1>", self._on_click)
+
+        # A single tooltip, shared by every thumbnail, to show its filepath
+        self.tooltip = SharedToolTip(self.canvas)
+        self.tooltip.attach("thumbnail", self.rectangle_filepaths.get)
+
+        # Enable scrolling with the mouse wheel when hovering the canvas. The
+        # thumbnails are canvas items rather than child widgets, so the canvas
+        # itself gets the events: <MouseWheel> on Windows/Mac, and <Button-4>
+        # and <Button-5> on Linux.
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Button-4>", self._on_mousewheel)
+        self.canvas.bind("<Button-5>", self._on_mousewheel)
+
+    def show_groups(self, groups, selected_filepaths):
+        """Replace the thumbnails with those of new groups of photos.
 
-        # Keep the inner frame the same width as the canvas so it stretches horizontally
-        self.canvas.bind(
-            "<Configure>",
-            lambda event: self.canvas.itemconfigure(
-                self.frame_window, width=event.width
-            ),
+        Args:
+            groups: List of lists of filepaths. Each group of photos is laid
+                out in its own rows, in alphabetical order, with a separator
+                underneath.
+            selected_filepaths: Set of the filepaths to show as selected.
+
+        The thumbnails are drawn without their images, which are set with
+        set_image once they've been loaded. Scrolls back to the top.
+        """
+        canvas = self.canvas
+        canvas.delete("all")
+        self.thumbnail_items.clear()
+        self.rectangle_filepaths.clear()
+        previous_filenames = self.filenames
+        self.filenames = {}
+
+        background = canvas.cget("background")
+        width = canvas.winfo_width()
+        border = self.border
+        size = self.size
+        center = border + size // 2
+
+        y = 0
+        for filepaths in groups:
+            # Run through the group's photos in alphabetical order
+            filepaths = sorted(filepaths, key=str.lower)
+            for i, filepath in enumerate(filepaths):
+                row, col = divmod(i, self.columns)
+                left = col * self.cell_width + self.padding
+                top = y + row * self.cell_height + self.padding
+
+                # Rectangle that takes the clicks and outlines the selection
+                rectangle = canvas.create_rectangle(
+                    left,
+                    top,
+                    left + size + 2 * border,
+                    top + size + 2 * border + self.text_height,
+                    fill=background,
+                    outline="black" if filepath in selected_filepaths else "",
+                    width=border,
+                    tags="thumbnail",
+                )
+
+                # Shorten the filename, unless it was already on the last page
+                filename = previous_filenames.get(filepath)
+                if filename is None:
+                    filename = self._fit_text(basename(filepath))
+                self.filenames[filepath] = filename
+
+                # Image and filename, which let events through to the rectangle
+                image = canvas.create_image(
+                    left + center, top + center, state="disabled"
+                )
+                canvas.create_text(
+                    left + center,
+                    top + border + size,
+                    anchor="n",
+                    text=filename,
+                    font=self.font,
+                    state="disabled",
+                )
+
+                self.thumbnail_items[filepath] = (rectangle, image)
+                self.rectangle_filepaths[rectangle] = filepath
+            y += ceil(len(filepaths) / self.columns) * self.cell_height
+
+            # Put in a visual separator spanning the full width of the canvas
+            y += self.padding
+            canvas.create_line(
+                10, y, max(width - 10, 10), y, fill="gray", tags="separator"
+            )
+            y += self.padding
+
+        canvas.configure(scrollregion=(0, 0, self.columns * self.cell_width, y))
+        canvas.yview_moveto(0.0)
+
+    def set_image(self, filepath, image):
+        """Show an image in the thumbnail of a photo.
+
+        Args:
+            filepath: Path to the photo. Photos not on the canvas are ignored.
+            image: PhotoImage to show, or "" to clear the thumbnail.
+        """
+        if filepath in self.thumbnail_items:
+            self.canvas.itemconfigure(self.thumbnail_items[filepath][1], image=image)
+
+    def set_selected(self, filepath, selected):
+        """Show whether a photo is selected, by outlining its thumbnail.
+
+        Args:
+            filepath: Path to the photo. Photos not on the canvas are ignored.
+            selected: Whether the photo is selected.
+        """
+        if filepath in self.thumbnail_items:
+            self.canvas.itemconfigure(
+                self.thumbnail_items[filepath][0],
+                outline="black" if selected else "",
+            )
+
+    def get_visible_filepaths(self, margin=0):
+        """Get the photos whose thumbnails are within the visible area.
+
+        Args:
+            margin: Distance above and below the visible area, in pixels, to
+                also count as visible.
+
+        Returns:
+            List of the filepaths of the visible thumbnails.
+        """
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        items = self.canvas.find_overlapping(
+            0, top - margin, self.columns * self.cell_width, bottom + margin
         )
+        rectangle_filepaths = self.rectangle_filepaths
+        return [
+            rectangle_filepaths[item] for item in items if item in rectangle_filepaths
+        ]
 
-        # Enable scrolling with the mouse wheel when hovering the canvas
-        self.canvas.bind("<Enter>", self._bind_mousewheel)
-        self.canvas.bind("<Leave>", self._unbind_mousewheel)
+    def _fit_text(self, text):
+        """Shorten text to fit under a thumbnail.
 
-    def _bind_mousewheel(self, _event):
-        """Bind mouse wheel events for scrolling.
+        Args:
+            text: Text to shorten.
+
+        Returns:
+            The text, with characters removed from the end and replaced by an
+            ellipsis if it's wider than the thumbnail. Canvas text isn't
+            clipped, so long filenames would otherwise overlap their neighbors.
+        """
+        if self.font.measure(text) <= self.size:
+            return text
+        while text and self.font.measure(text + "…") > self.size:
+            text = text[:-1]
+        return text + "…"
+
+    def _on_click(self, _event):
+        """Call the command with the photo whose thumbnail was clicked.
 
         Args:
-            _event: Tkinter event object (unused).
+            _event: Tkinter event object (unused). The clicked item is the
+                canvas's current item.
+        """
+        rectangle = self.canvas.find_withtag("current")[0]
+        self.command(self.rectangle_filepaths[rectangle])
+
+    def _on_configure(self, event):
+        """Stretch the separators to the new width of the canvas.
 
-        Binds mouse wheel events (<MouseWheel> for Windows/Mac,
-        <Button-4> and <Button-5> for Linux) to enable scrolling
-        when the mouse enters the canvas area.
+        Args:
+            event: Tkinter event object containing the canvas's new size.
         """
-        self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
-        self.canvas.bind_all("<Button-4>", self._on_mousewheel)
-        self.canvas.bind_all("<Button-5>", self._on_mousewheel)
+        for separator in self.canvas.find_withtag("separator"):
+            y = self.canvas.coords(separator)[1]
+            self.canvas.coords(separator, 10, y, max(event.width - 10, 10), y)
 
-    def _unbind_mousewheel(self, _event):
-        """Unbind mouse wheel events when mouse leaves the canvas.
+    def _on_yscroll(self, first, last):
+        """Update the scrollbar and announce that the visible area changed.
 
         Args:
-            _event: Tkinter event object (unused).
+            first: Fraction of the content above the visible area.
+            last: Fraction of the content up to the bottom of the visible area.
 
-        Removes all mouse wheel event bindings when the mouse leaves
-        the canvas area to prevent scrolling when not hovering over
-        the scrollable frame.
+        The canvas calls this whenever its view moves, is resized, or its
+        scrollregion changes. Generates a <<ViewChanged>> virtual event so
+        that callers can render only the content that is currently visible.
         """
-        self.canvas.unbind_all("<MouseWheel>")
-        self.canvas.unbind_all("<Button-4>")
-        self.canvas.unbind_all("<Button-5>")
+        self.scrollbar.set(first, last)
+        self.event_generate("<<ViewChanged>>")
 
     def _on_mousewheel(self, event):
         """Handle mouse wheel scrolling events.
@@ -126,11 +358,23 @@ class VerticalScrollFrame(ttk.Frame):
         Scrolls the canvas vertically based on mouse wheel input.
         Handles both Linux-style button events (Button-4 for scroll up,
         Button-5 for scroll down) and Windows/Mac-style delta events.
+        Fast wheels and touchpads send many events at once, so the steps are
+        added up and scrolled in one go once the GUI is idle, redrawing the
+        canvas once rather than for every event.
         """
         if event.num == 4:
-            self.canvas.yview_scroll(-1, "units")
+            self.pending_scroll -= 1
         elif event.num == 5:
-            self.canvas.yview_scroll(1, "units")
+            self.pending_scroll += 1
         elif event.delta:
-            direction = -1 if event.delta > 0 else 1
-            self.canvas.yview_scroll(direction, "units")
+            self.pending_scroll += -1 if event.delta > 0 else 1
+
+        if self._scroll_running is None:
+            self._scroll_running = self.after_idle(self._scroll)
+
+    def _scroll(self):
+        """Scroll the canvas by the mouse wheel steps added up since last time."""
+        self._scroll_running = None
+        if self.pending_scroll:
+            self.canvas.yview_scroll(self.pending_scroll, "units")
+            self.pending_scroll = 0